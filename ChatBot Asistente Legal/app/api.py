@@ -1,35 +1,462 @@
+import asyncio
+import json
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List
 from pydantic import BaseModel
-from app.index import init_pinecone, build_embeddings_model
-from app.query import LegalSearcher, compose_answer
+from app.batcher import MicroBatcher
+from app.cache import SingleFlight, TTLCache, normalize_question
+from app.index import (
+    init_index, build_embeddings_model, index_root, load_article_lookup, load_bm25, read_index_generation, source_key,
+    VECTOR_BACKEND,
+)
+from app.metrics import (
+    BATCH_SIZE, REGISTRY, REQUEST_SECONDS, STAGE_SECONDS, Gauge, observe_stages, record_load_time, timed_load,
+)
+from app.query import LegalSearcher, build_reranker, compose_answer
+from app.workers import InferencePool, PoolSaturated
 
 load_dotenv()
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "legal-assistant")
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "1024"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "600"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE = int(os.getenv("INFERENCE_QUEUE", "32"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+# Micro-batching de /ask: ventana en ms (0 = desactivado) y tamaño máximo del lote
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "16"))
+# /ask_batch: preguntas por petición y por tarea del pool (un encode y un predict por tarea)
+ASK_BATCH_MAX_ITEMS = int(os.getenv("ASK_BATCH_MAX_ITEMS", "1000"))
+ASK_BATCH_CHUNK = int(os.getenv("ASK_BATCH_CHUNK", "64"))
+# 🔹 Carga de índice y modelos:
+#   "background": en un hilo al arrancar; el puerto se abre enseguida y /ready indica cuándo hay servicio
+#   "eager": al importar el módulo (comportamiento anterior)
+#   "preload": la hace el proceso padre de app/server.py antes del fork; cada worker sólo calienta
+MODEL_LOADING = os.getenv("MODEL_LOADING", "background").lower()
+# Cada cuánto se mira el alias VERSION para pasar a una versión nueva del índice (blue/green)
+INDEX_POLL_SECONDS = float(os.getenv("INDEX_POLL_SECONDS", "2"))
 
-index = init_pinecone()
-embed_model = build_embeddings_model()
-searcher = LegalSearcher(index, embed_model)
+_started_at = time.perf_counter()
+_load_lock = threading.Lock()
+_ready = threading.Event()
+_load_error = None
+
+index = None
+embed_model = None
+searcher = None
+
+def load_models():
+    """Índice, modelos y tablas auxiliares; una sola vez por proceso (o en el padre, antes del fork)."""
+    global index, embed_model, searcher
+    with _load_lock:
+        if searcher is not None:
+            return
+        generation = read_index_generation()
+        root = index_root(generation[0])
+        index = timed_load("index", init_index, generation[0])
+        embed_model = timed_load("embeddings", build_embeddings_model)
+        searcher = LegalSearcher(
+            index, embed_model,
+            bm25=timed_load("bm25", load_bm25, root),
+            articles=timed_load("articles", load_article_lookup, root),
+            reranker=timed_load("reranker", build_reranker),
+            generation=generation,
+        )
+
+def load_and_warm_up():
+    """Carga (si hace falta), calienta los modelos en este proceso y marca la API como lista."""
+    global index, _load_error
+    try:
+        if searcher is not None and MODEL_LOADING == "preload" and VECTOR_BACKEND == "pinecone":
+            # Las conexiones HTTP del cliente no se comparten entre procesos: cada worker abre las suyas
+            index = searcher.index = init_index(searcher.version)
+        load_models()
+        timed_load("warmup", searcher.warm_up)
+        record_load_time("ready", time.perf_counter() - _started_at)
+        _ready.set()
+        print(f"✅ API lista en {time.perf_counter() - _started_at:.1f}s.")
+    except Exception as e:
+        _load_error = e
+        print(f"❌ No se pudieron cargar los modelos: {e}")
+
+_failed_generation = None
+
+def switch_index_version():
+    """
+    Si el alias VERSION apunta a otra versión (o se volvió a publicar la misma
+    tras actualizarla en el sitio), carga un buscador sobre ella (índice, BM25
+    y tabla de artículos) y lo pone en servicio de una vez; las consultas en
+    curso terminan con el anterior.
+    """
+    global searcher, index, _failed_generation
+    generation = read_index_generation()
+    if searcher is None or generation in (searcher.generation, _failed_generation):
+        return
+    version = generation[0]
+    start = time.perf_counter()
+    try:
+        fresh = searcher.with_generation(generation)
+    except Exception as e:
+        _failed_generation = generation
+        print(f"⚠️ No se pudo cargar la versión {version} del índice; se sigue con {searcher.version}: {e}")
+        return
+    action = "recargado (versión actualizada en el sitio)" if version == searcher.version else "cambiado a la versión"
+    searcher, index = fresh, fresh.index
+    print(f"🔄 Índice {action} {version} en {time.perf_counter() - start:.1f}s.")
+
+def watch_index_version():
+    while True:
+        time.sleep(INDEX_POLL_SECONDS)
+        switch_index_version()
+
+if MODEL_LOADING in ("eager", "preload"):
+    load_models()
+    if MODEL_LOADING == "eager":
+        load_and_warm_up()
+
+# 🔹 (versión del índice, ley, pregunta normalizada, top_k) -> resultados
+results_cache = TTLCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL)
+inflight = SingleFlight()
+_cached_generation = None
+
+# 🔹 La inferencia corre en un pool acotado, nunca en el event loop. Pool y batcher
+# (que tiene su propio hilo) se crean al arrancar cada proceso, después de un posible fork.
+pool = None
+batcher = None
+
+def results_key(ley: str, question: str, top_k: int):
+    global _cached_generation
+    generation = searcher.generation
+    if generation != _cached_generation:
+        # run_index.py publicó una versión nueva (o actualizó la activa): lo cacheado ya no sirve
+        results_cache.clear()
+        _cached_generation = generation
+    return (generation, source_key(ley), normalize_question(question), top_k)
+
+def search_once(key, ley: str, question: str, top_k: int):
+    def compute():
+        # Otra petición pudo calcularla mientras ésta esperaba en la cola del pool
+        cached = results_cache.peek(key)
+        if cached is not None:
+            return cached
+        timings = {}
+        found = searcher.search(question, top_k=top_k, source=ley, timings=timings)
+        observe_stages(timings)
+        results_cache.put(key, found)
+        return found
+
+    # Preguntas idénticas que llegan a la vez se calculan una sola vez
+    return inflight.do(key, compute)
+
+def search_batch(items):
+    """
+    Lote del micro-batcher: items = [(key, ley, pregunta, top_k)]. Las claves
+    repetidas en el lote o en curso en otra petición se calculan una sola vez
+    (single-flight), y las que un lote anterior ya dejó en la caché no se recalculan.
+    """
+    requests = {}
+    for key, ley, question, top_k in items:
+        requests.setdefault(key, (question, top_k, ley))
+
+    def compute(keys):
+        found = {key: results_cache.peek(key) for key in keys}
+        missing = [key for key, results in found.items() if results is None]
+        if missing:
+            timings = {}
+            for key, results in zip(missing, searcher.search_many([requests[key] for key in missing], timings)):
+                results_cache.put(key, results)
+                found[key] = results
+            observe_stages(timings)
+        return [found[key] for key in keys]
+
+    by_key = inflight.do_many([key for key, _, _, _ in items], compute)
+    return [by_key[key] for key, _, _, _ in items]
+
+# 🔹 Gauges de /metrics: se leen de los objetos vivos en cada scrape
+def _caches():
+    caches = [("results", results_cache)]
+    if searcher is not None:
+        caches.insert(0, ("embeddings", searcher.embed_cache))
+    return caches
+
+def _cache_counts(attr: str):
+    return lambda: {(name,): getattr(cache, attr) for name, cache in _caches()}
+
+def _hit_ratios():
+    ratios = {}
+    for name, cache in _caches():
+        total = cache.hits + cache.misses
+        ratios[(name,)] = cache.hits / total if total else 0.0
+    return ratios
+
+REGISTRY.register(Gauge("legal_cache_hits_total", "Aciertos de caché.", _cache_counts("hits"), ["cache"], "counter"))
+REGISTRY.register(Gauge("legal_cache_misses_total", "Fallos de caché.", _cache_counts("misses"), ["cache"], "counter"))
+REGISTRY.register(Gauge("legal_cache_hit_ratio", "Aciertos / consultas de cada caché desde el arranque.", _hit_ratios, ["cache"]))
+REGISTRY.register(Gauge(
+    "legal_queue_depth", "Peticiones esperando inferencia.",
+    lambda: {
+        ("pool",): pool.queue_depth if pool is not None else 0,
+        ("batcher",): batcher.queue_depth if batcher is not None else 0,
+    },
+    ["queue"],
+))
+REGISTRY.register(Gauge(
+    "legal_inference_in_flight", "Tareas del pool de inferencia en curso o en cola.",
+    lambda: pool.in_flight if pool is not None else 0,
+))
+REGISTRY.register(Gauge("legal_ready", "1 cuando índice y modelos están cargados y calientes.", lambda: int(_ready.is_set())))
 
 app = FastAPI()
 
+@app.on_event("startup")
+def start_workers():
+    global pool, batcher, _started_at
+    if MODEL_LOADING == "preload":
+        _started_at = time.perf_counter()  # en el worker recién creado, no en la importación del padre
+    pool = InferencePool(INFERENCE_WORKERS, INFERENCE_QUEUE, INFERENCE_TIMEOUT)
+    if BATCH_WINDOW_MS > 0:
+        # Los lotes se calculan en el pool: una sola cola y un solo límite de inferencia para todo
+        batcher = MicroBatcher(
+            search_batch, BATCH_WINDOW_MS, BATCH_MAX_SIZE, INFERENCE_QUEUE, INFERENCE_TIMEOUT,
+            submit=pool.submit, on_batch=BATCH_SIZE.observe,
+        )
+    if not _ready.is_set():
+        # Sin bloquear el arranque: uvicorn acepta conexiones y /ready responde 503 mientras tanto
+        threading.Thread(target=load_and_warm_up, name="model-loader", daemon=True).start()
+    threading.Thread(target=watch_index_version, name="index-version", daemon=True).start()
+
 class QuestionRequest(BaseModel):
     question: str
     top_k: int = 3
 
+class BatchItem(BaseModel):
+    law: str
+    question: str
+    top_k: int = 3
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    stream: bool = False
+
+def timed_response(start: float, path: str, spans: dict, content: dict, status_code: int = 200) -> JSONResponse:
+    """Registra la duración de /ask y la devuelve en Server-Timing (el cliente deduce el tiempo de red)."""
+    total = time.perf_counter() - start
+    REQUEST_SECONDS.observe(total, path)
+    spans = dict(spans, total=total)
+    server_timing = ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in spans.items())
+    return JSONResponse(status_code=status_code, content=content, headers={"Server-Timing": server_timing})
+
 @app.post("/ask/{ley}")
 async def ask_question(ley: str, request: QuestionRequest):
+    start = time.perf_counter()
+    path = "lookup"
+    spans = {}
+    if not _ready.is_set():
+        answer = "⏳ El asistente se está iniciando, intenta de nuevo en unos segundos."
+        return timed_response(start, "starting", spans, {"answer": answer}, 503)
     try:
-        results = searcher.search(request.question, top_k=request.top_k)
-        results = [r for r in results if r.get("source") == ley]
+        # "¿Qué dice el artículo N?": respuesta exacta desde la tabla, sin pasar por el pool
+        results = searcher.lookup_article(request.question, request.top_k, ley)
+        if results is None:
+            path = "cache"
+            key = results_key(ley, request.question, request.top_k)
+            results = results_cache.get(key)
+        if results is None:
+            path = "batch" if batcher is not None else "pool"
+            search_start = time.perf_counter()
+            if batcher is not None:
+                results = await batcher.run((key, ley, request.question, request.top_k))
+            else:
+                results = await pool.run(search_once, key, ley, request.question, request.top_k)
+            spans["search"] = time.perf_counter() - search_start
+        compose_start = time.perf_counter()
         answer = compose_answer(results, request.question)
+        spans["compose"] = time.perf_counter() - compose_start
+        STAGE_SECONDS.observe(spans["compose"], "compose")
+    except PoolSaturated:
+        return timed_response(start, "saturated", spans, {"answer": "⚠️ El servidor está ocupado, intenta de nuevo en unos segundos."}, 503)
+    except asyncio.TimeoutError:
+        return timed_response(start, "timeout", spans, {"answer": "⚠️ La consulta tardó demasiado, intenta de nuevo."}, 504)
     except Exception as e:
+        path = "error"
         answer = f"⚠️ Error interno: {str(e)}"
-    return {"answer": answer}
+    return timed_response(start, path, spans, {"answer": answer})
+
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def hit_summary(results):
+    return [
+        {"id": r["id"], "article_number": r.get("article_number"), "title": r.get("title"), "source": r.get("source")}
+        for r in results
+    ]
+
+@app.post("/ask/{ley}/stream")
+async def ask_question_stream(ley: str, request: QuestionRequest):
+    """
+    Lo mismo que /ask por Server-Sent Events, por etapas:
+    "hits" (candidatos del índice, antes del reranker), "reranked" (orden final),
+    "answer" (texto de compose_answer) y "done". Si algo falla: "error".
+    """
+    async def events():
+        start = time.perf_counter()
+        path = "lookup"
+        timings = {}
+        try:
+            if not _ready.is_set():
+                path = "starting"
+                yield sse("error", {"answer": "⏳ El asistente se está iniciando, intenta de nuevo en unos segundos."})
+                return
+            results = searcher.lookup_article(request.question, request.top_k, ley)
+            if results is None:
+                path = "cache"
+                key = results_key(ley, request.question, request.top_k)
+                results = results_cache.get(key)
+            if results is None:
+                path = "stream"
+                # Los candidatos densos salen en cuanto están; el cross-encoder va después
+                found = await pool.run(searcher.candidates, request.question, request.top_k, ley, timings)
+                yield sse("hits", {"hits": hit_summary(found)})
+                results = await pool.run(searcher.rerank, request.question, found, request.top_k, timings)
+                observe_stages(timings)
+                results_cache.put(key, results)
+            else:
+                yield sse("hits", {"hits": hit_summary(results)})
+            yield sse("reranked", {"hits": hit_summary(results)})
+            compose_start = time.perf_counter()
+            yield sse("answer", {"answer": compose_answer(results, request.question)})
+            STAGE_SECONDS.observe(time.perf_counter() - compose_start, "compose")
+            yield sse("done", {"ms": round((time.perf_counter() - start) * 1000, 1)})
+        except PoolSaturated:
+            path = "saturated"
+            yield sse("error", {"answer": "⚠️ El servidor está ocupado, intenta de nuevo en unos segundos."})
+        except asyncio.TimeoutError:
+            path = "timeout"
+            yield sse("error", {"answer": "⚠️ La consulta tardó demasiado, intenta de nuevo."})
+        except Exception as e:
+            path = "error"
+            yield sse("error", {"answer": f"⚠️ Error interno: {str(e)}"})
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, path)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def answer_chunk(items: List[BatchItem]):
+    """Tarea del pool para un trozo de /ask_batch: caché y tabla de artículos primero, el resto en un lote."""
+    found = [searcher.lookup_article(item.question, item.top_k, item.law) for item in items]
+    keys = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        if found[i] is None:
+            keys[i] = results_key(item.law, item.question, item.top_k)
+            found[i] = results_cache.get(keys[i])
+        if found[i] is None:
+            pending.append(i)
+    if pending:
+        searched = search_batch([(keys[i], items[i].law, items[i].question, items[i].top_k) for i in pending])
+        for i, results in zip(pending, searched):
+            found[i] = results
+    return [
+        {
+            "law": item.law,
+            "question": item.question,
+            "answer": compose_answer(results, item.question),
+            "hits": hit_summary(results),
+        }
+        for item, results in zip(items, found)
+    ]
+
+def failed_chunk(chunk: List[BatchItem], field: str, message: str):
+    """Una entrada por pregunta de un trozo que no se pudo resolver."""
+    return [{"law": item.law, "question": item.question, field: message} for item in chunk]
+
+async def resolve_chunk(chunk: List[BatchItem]):
+    """Respuestas de un trozo de /ask_batch; si falla, un error por pregunta (los demás trozos siguen)."""
+    try:
+        return await pool.run(answer_chunk, chunk)
+    except PoolSaturated:
+        return failed_chunk(chunk, "error", "⚠️ El servidor está ocupado")
+    except asyncio.TimeoutError:
+        return failed_chunk(chunk, "error", "⚠️ La consulta tardó demasiado")
+    except Exception as e:
+        return failed_chunk(chunk, "error", f"⚠️ Error interno: {str(e)}")
+
+@app.post("/ask_batch")
+async def ask_batch(request: BatchRequest):
+    """
+    Muchas preguntas (ley, pregunta, top_k) en una petición. Se resuelven por
+    trozos de ASK_BATCH_CHUNK: un encode, consultas agrupadas por ley y un predict
+    del cross-encoder por trozo. Las respuestas vuelven en el orden de entrada;
+    con "stream": true, como NDJSON (una línea por pregunta) según se terminan.
+    Si un trozo no se puede resolver, sus preguntas llevan "error" en vez de respuesta.
+    """
+    start = time.perf_counter()
+    if not _ready.is_set():
+        answer = "⏳ El asistente se está iniciando, intenta de nuevo en unos segundos."
+        return timed_response(start, "starting", {}, {"answer": answer}, 503)
+    if len(request.items) > ASK_BATCH_MAX_ITEMS:
+        answer = f"⚠️ Máximo {ASK_BATCH_MAX_ITEMS} preguntas por lote."
+        return timed_response(start, "batch_request", {}, {"answer": answer}, 413)
+    chunks = [request.items[i:i + ASK_BATCH_CHUNK] for i in range(0, len(request.items), ASK_BATCH_CHUNK)]
+
+    if not request.stream:
+        # Un trozo que falla (servidor ocupado, timeout, error) no tira las respuestas ya calculadas
+        answers = []
+        for chunk in chunks:
+            answers.extend(await resolve_chunk(chunk))
+        return timed_response(start, "batch_request", {}, {"results": answers})
+
+    async def lines():
+        offset = 0
+        try:
+            for chunk in chunks:
+                answers = await resolve_chunk(chunk)
+                for i, answer in enumerate(answers):
+                    yield json.dumps(dict(answer, index=offset + i), ensure_ascii=False) + "\n"
+                offset += len(chunk)
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - start, "batch_request")
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 @app.get("/")
 async def root():
-    return {"status": "API Legal Assistant activa 🚀"}
\ No newline at end of file
+    return {"status": "API Legal Assistant activa 🚀"}
+
+@app.get("/ready")
+async def ready():
+    if _ready.is_set():
+        return {"ready": True}
+    content = {"ready": False}
+    if _load_error is not None:
+        content["error"] = str(_load_error)
+    return JSONResponse(status_code=503, content=content)
+
+@app.get("/cache")
+async def cache_stats():
+    if searcher is None:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {
+        "index_version": searcher.version,
+        "embeddings": searcher.embed_cache.stats(),
+        "results": results_cache.stats(),
+        "coalesced": inflight.shared,
+    }
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.on_event("shutdown")
+def shutdown_pool():
+    if batcher is not None:
+        batcher.shutdown()
+    if pool is not None:
+        pool.shutdown()
\ No newline at end of file
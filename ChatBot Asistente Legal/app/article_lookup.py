@@ -0,0 +1,79 @@
+"""
+Tabla local (ley, número de artículo) -> chunks, para responder de forma exacta
+y sin embeddings preguntas del tipo "¿qué dice el artículo 134 del Código del Trabajo?".
+
+Se guarda un archivo por ley (``<source_key>.json``), escrito por run_index.py
+a partir de la salida de split_by_articles.
+"""
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+ARTICLE_REF = re.compile(r"\b(?:art[íi]culo|art\.?)\s*(?:n(?:[°º.o]|ro\.?|úm(?:ero)?\.?)\s*)?(\d+)\b", re.IGNORECASE)
+
+
+def find_article_reference(query: str) -> Optional[str]:
+    """Número de artículo citado en la pregunta ("art. 134", "artículo 47"), o None."""
+    m = ARTICLE_REF.search(query)
+    return m.group(1) if m else None
+
+
+def base_article(number) -> str:
+    """'47.1' o '7.c' pertenecen al artículo 47 / 7."""
+    return str(number or "").split(".")[0]
+
+
+def _source_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.json")
+
+
+def write_source(directory: str, key: str, chunks: List[Tuple[str, str, Dict]]):
+    """Agrupa los chunks (id, texto, metadata) de una ley por número de artículo."""
+    os.makedirs(directory, exist_ok=True)
+    table: Dict[str, Dict[str, Dict]] = {}
+    for chunk_id, _, metadata in chunks:
+        # De un artículo repetido sólo se responde la primera aparición: las posteriores
+        # suelen ser referencias ("artículo 95 de este Código") que el segmentador toma
+        # como encabezado. Siguen en el índice vectorial y en BM25 con su propio id.
+        if metadata.get("occurrence", 1) > 1:
+            continue
+        table.setdefault(base_article(metadata["article_number"]), {})[chunk_id] = dict(metadata, id=chunk_id)
+
+    path = _source_path(directory, key)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({n: list(entries.values()) for n, entries in table.items()}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def has_source(directory: str, key: str) -> bool:
+    return os.path.exists(_source_path(directory, key))
+
+
+def remove_source(directory: str, key: str):
+    path = _source_path(directory, key)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ArticleLookup:
+    def __init__(self, tables: Dict[str, Dict[str, List[Dict]]]):
+        self.tables = tables
+
+    def __len__(self) -> int:
+        return sum(len(t) for t in self.tables.values())
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["ArticleLookup"]:
+        if not os.path.isdir(directory):
+            return None
+        tables = {}
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json"):
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    tables[name[: -len(".json")]] = json.load(f)
+        return cls(tables) if tables else None
+
+    def get(self, key: str, number: str) -> List[Dict]:
+        return self.tables.get(key, {}).get(base_article(number), [])
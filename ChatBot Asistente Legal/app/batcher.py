@@ -0,0 +1,128 @@
+"""
+Micro-batching de peticiones concurrentes: junta lo que llega dentro de una
+ventana de pocos milisegundos y lo procesa con una sola llamada a `fn`
+(un encode y un predict para todo el lote), repartiendo luego los resultados.
+
+El hilo del batcher sólo arma los lotes: con `submit` (p. ej. InferencePool.submit)
+cada lote se calcula en ese pool, que es el que limita la inferencia; sin él,
+en el propio hilo del batcher.
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.workers import PoolSaturated
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], List[Any]],
+        window_ms: float = 5.0,
+        max_batch: int = 16,
+        max_queue: int = 64,
+        timeout: float = 30.0,
+        submit: Optional[Callable[..., Future]] = None,
+        on_batch: Optional[Callable[[int], None]] = None,
+    ):
+        self.fn = fn
+        self.dispatch = submit
+        self.on_batch = on_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.batches = 0
+        self.batched_items = 0
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> Future:
+        if self._queue.qsize() >= self.max_queue:
+            raise PoolSaturated()
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    async def run(self, item: Any, timeout: Optional[float] = None) -> Any:
+        future = self.submit(item)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+
+    def shutdown(self):
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    def _loop(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+
+            # Esperar como mucho `window` desde la primera petición o hasta llenar el lote
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            stop = False
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            self._run_batch(batch)
+            if stop:
+                return
+
+    def _run_batch(self, batch: List[Tuple[Any, Future]]):
+        # Peticiones que el cliente ya abandonó (timeout) no se calculan
+        batch = [(item, f) for item, f in batch if f.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batches += 1
+        self.batched_items += len(batch)
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+        items = [item for item, _ in batch]
+        if self.dispatch is None:
+            try:
+                results = self.fn(items)
+            except Exception as e:
+                self._fail(batch, e)
+                return
+            self._deliver(batch, results)
+            return
+
+        try:
+            done = self.dispatch(self.fn, items)
+        except Exception as e:  # PoolSaturated: el lote entero recibe el error
+            self._fail(batch, e)
+            return
+        done.add_done_callback(
+            lambda d: self._fail(batch, d.exception()) if d.exception() is not None else self._deliver(batch, d.result())
+        )
+
+    @staticmethod
+    def _deliver(batch: List[Tuple[Any, Future]], results: List[Any]):
+        for (_, f), result in zip(batch, results):
+            f.set_result(result)
+
+    @staticmethod
+    def _fail(batch: List[Tuple[Any, Future]], error: BaseException):
+        for _, f in batch:
+            f.set_exception(error)
@@ -0,0 +1,124 @@
+"""
+Índice invertido BM25 local sobre los mismos chunks del índice vectorial.
+Capta términos exactos ("despido intempestivo", "contravención") que los
+embeddings difuminan; se combina con la búsqueda densa por RRF en LegalSearcher.
+
+Se guarda un archivo por ley (``<source_key>.json.gz``) para que run_index.py
+sólo reescriba las leyes que cambiaron.
+"""
+import gzip
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+STOPWORDS = {
+    "a", "al", "ante", "con", "como", "cual", "cuales", "cuando", "cuanto", "cuantos",
+    "cuantas", "de", "del", "donde", "el", "en", "es", "esta", "este", "la", "las", "le",
+    "les", "lo", "los", "mas", "o", "para", "por", "que", "quien", "se", "segun", "si",
+    "sin", "sobre", "su", "sus", "u", "un", "una", "uno", "y", "ya",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [t for t in re.findall(r"[a-z0-9]+", text) if t not in STOPWORDS]
+
+
+def _source_path(directory: str, key: str) -> str:
+    return os.path.join(directory, f"{key}.json.gz")
+
+
+def write_source(directory: str, key: str, chunks: List[Tuple[str, str, Dict]]):
+    """Guarda frecuencias de términos y metadata de los chunks (id, texto, metadata) de una ley."""
+    os.makedirs(directory, exist_ok=True)
+    docs = []
+    for chunk_id, text, metadata in chunks:
+        tokens = tokenize(text)
+        docs.append({"id": chunk_id, "len": len(tokens), "tf": Counter(tokens), "metadata": metadata})
+
+    path = _source_path(directory, key)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump({"source_key": key, "docs": docs}, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def has_source(directory: str, key: str) -> bool:
+    return os.path.exists(_source_path(directory, key))
+
+
+def remove_source(directory: str, key: str):
+    path = _source_path(directory, key)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class BM25Index:
+    def __init__(self, docs: List[Dict], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = [d["id"] for d in docs]
+        self.metadata = [d["metadata"] for d in docs]
+        self.doc_len = np.array([d["len"] for d in docs], dtype=np.float32)
+        self.avg_len = float(self.doc_len.mean()) if docs else 0.0
+
+        postings = defaultdict(lambda: ([], []))
+        by_source = defaultdict(list)
+        for i, d in enumerate(docs):
+            for term, tf in d["tf"].items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+            by_source[d["metadata"].get("source_key")].append(i)
+
+        n = len(docs)
+        self.postings = {}
+        for term, (rows, tfs) in postings.items():
+            df = len(rows)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            self.postings[term] = (np.array(rows, dtype=np.int64), np.array(tfs, dtype=np.float32), idf)
+        self.by_source = {k: np.array(v, dtype=np.int64) for k, v in by_source.items()}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["BM25Index"]:
+        if not os.path.isdir(directory):
+            return None
+        docs = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".json.gz"):
+                with gzip.open(os.path.join(directory, name), "rt", encoding="utf-8") as f:
+                    docs.extend(json.load(f)["docs"])
+        return cls(docs) if docs else None
+
+    def search(self, query: str, top_k: int, source_key: Optional[str] = None) -> List[Tuple[float, str, Dict]]:
+        """Devuelve (score, id, metadata) de los mejores chunks, opcionalmente de una sola ley."""
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.avg_len, 1e-9))
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            rows, tfs, idf = posting
+            scores[rows] += idf * tfs * (self.k1 + 1) / (tfs + norm[rows])
+
+        if source_key is not None:
+            rows = self.by_source.get(source_key, np.array([], dtype=np.int64))
+        else:
+            rows = np.arange(len(self.ids))
+        rows = rows[scores[rows] > 0]
+        if rows.size == 0:
+            return []
+
+        k = min(top_k, rows.size)
+        best = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), self.ids[i], self.metadata[i]) for i in best]
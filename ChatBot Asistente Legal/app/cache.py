@@ -0,0 +1,176 @@
+"""
+Cachés en memoria para la API: LRU (embeddings de preguntas), TTL (resultados
+finales) y single-flight para que preguntas idénticas concurrentes se calculen
+una sola vez.
+"""
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+_MISSING = object()
+
+
+def normalize_question(question: str) -> str:
+    """Clave de caché: minúsculas, sin signos de interrogación/exclamación y espacios colapsados."""
+    text = unicodedata.normalize("NFC", question).lower()
+    text = re.sub(r"[¿?¡!.,;:\"']", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Como get() pero sin contar acierto/fallo ni cambiar el orden LRU."""
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+        return default if value is _MISSING else value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class TTLCache(LRUCache):
+    """LRU cuyas entradas caducan `ttl` segundos después de guardarse."""
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0):
+        super().__init__(maxsize)
+        self.ttl = ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().get(key, _MISSING)
+        if entry is _MISSING:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+            return default
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        entry = super().peek(key, _MISSING)
+        if entry is _MISSING or entry[0] < time.monotonic():
+            return default
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any):
+        super().put(key, (time.monotonic() + self.ttl, value))
+
+
+class SingleFlight:
+    """Si varios hilos piden la misma clave a la vez, sólo el primero ejecuta `fn`."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, "_Call"] = {}
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def do_many(self, keys: List[Hashable], fn: Callable[[List[Hashable]], List[Any]]) -> Dict[Hashable, Any]:
+        """
+        do() para varias claves: `fn(claves)` calcula de una vez las que nadie
+        está calculando ya; las repetidas y las que ya están en curso en otro
+        hilo esperan ese resultado. Devuelve {clave: resultado}.
+        """
+        own: Dict[Hashable, _Call] = {}
+        waiting: Dict[Hashable, _Call] = {}
+        with self._lock:
+            for key in keys:
+                if key in own or key in waiting:
+                    self.shared += 1
+                    continue
+                call = self._calls.get(key)
+                if call is None:
+                    own[key] = self._calls[key] = _Call()
+                else:
+                    waiting[key] = call
+                    self.shared += 1
+
+        try:
+            if own:
+                for call, result in zip(own.values(), fn(list(own))):
+                    call.result = result
+        except BaseException as e:
+            for call in own.values():
+                call.error = e
+            raise
+        finally:
+            with self._lock:
+                for key in own:
+                    del self._calls[key]
+            for call in own.values():
+                call.done.set()
+
+        results = {key: call.result for key, call in own.items()}
+        for key, call in waiting.items():
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            results[key] = call.result
+        return results
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[Any] = None
+        self.error: Optional[BaseException] = None
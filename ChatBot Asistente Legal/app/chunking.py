@@ -0,0 +1,89 @@
+"""
+Chunker por tokens: corta cada artículo en trozos que caben en la ventana del
+modelo de embeddings, respetando límites de oración e incisos. Con el chunker
+por caracteres (3000 chars) la mayor parte de cada chunk largo quedaba fuera
+de la ventana y el modelo la truncaba sin avisar.
+"""
+import re
+from typing import Dict, List, Tuple
+
+# Fin de oración / punto y coma, o salto de línea antes de un inciso ("a)", "b.", "1.")
+SEGMENT_BOUNDARY = re.compile(r"(?<=[.;:])\s+|\n(?=\s*(?:[a-zA-Z]\)|[a-h]\.|\d+\.)\s)")
+
+SPECIAL_TOKENS = 2  # [CLS] y [SEP]
+MIN_BODY_TOKENS = 32
+
+
+def segment_spans(text: str) -> List[Tuple[int, int]]:
+    """(inicio, fin) de cada oración/inciso dentro del texto original."""
+    spans = []
+    start = 0
+    for m in SEGMENT_BOUNDARY.finditer(text):
+        if m.start() > start:
+            spans.append((start, m.start()))
+        start = m.end()
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def count_tokens(tokenizer, texts: List[str]) -> List[int]:
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+
+
+def _split_long_span(tokenizer, text: str, start: int, end: int, budget: int) -> List[Tuple[int, int, int]]:
+    """Parte un segmento más largo que la ventana en trozos de `budget` tokens usando los offsets."""
+    enc = tokenizer(text[start:end], add_special_tokens=False, return_offsets_mapping=True)
+    offsets = enc["offset_mapping"]
+    pieces = []
+    for i in range(0, len(offsets), budget):
+        piece_start = start + offsets[i][0]
+        last = min(i + budget, len(offsets))
+        piece_end = start + offsets[last][0] if last < len(offsets) else end
+        pieces.append((piece_start, piece_end, last - i))
+    return pieces
+
+
+def chunk_by_tokens(header: str, body: str, tokenizer, max_tokens: int) -> List[str]:
+    """
+    Empaqueta oraciones/incisos consecutivos del cuerpo hasta llenar la ventana;
+    cada chunk lleva el encabezado del artículo para no perder el contexto.
+    """
+    header_tokens = count_tokens(tokenizer, [header])[0]
+    budget = max(max_tokens - SPECIAL_TOKENS - header_tokens, MIN_BODY_TOKENS)
+
+    spans = segment_spans(body)
+    sizes = count_tokens(tokenizer, [body[s:e] for s, e in spans])
+    pieces: List[Tuple[int, int, int]] = []
+    for (s, e), n in zip(spans, sizes):
+        if n > budget:
+            pieces.extend(_split_long_span(tokenizer, body, s, e, budget))
+        else:
+            pieces.append((s, e, n))
+
+    if not pieces:
+        return [header.rstrip()]
+
+    chunks = []
+    chunk_start, chunk_end, used = pieces[0]
+    for s, e, n in pieces[1:]:
+        if used + n > budget:
+            chunks.append(header + body[chunk_start:chunk_end])
+            chunk_start, used = s, 0
+        chunk_end = e
+        used += n
+    chunks.append(header + body[chunk_start:chunk_end])
+    return chunks
+
+
+def truncated_tokens(tokenizer, texts: List[str], max_tokens: int) -> Tuple[int, int]:
+    """(tokens totales, tokens que el modelo descartaría) para una lista de chunks."""
+    sizes = count_tokens(tokenizer, texts)
+    window = max_tokens - SPECIAL_TOKENS
+    return sum(sizes), sum(max(0, n - window) for n in sizes)
+
+
+def article_header(article: Dict) -> str:
+    return f"Artículo {article['article_number']}: {article.get('title', '')}\n"
@@ -0,0 +1,69 @@
+"""
+Evaluación de LegalSearcher sobre un archivo gold de preguntas con los
+artículos esperados: recall@k, MRR y latencia por etapa.
+
+La usan run_index.py, para validar una versión nueva del índice antes de
+publicarla, y bench/retrieval.py.
+"""
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.article_lookup import base_article
+from app.index import index_root, init_index, load_bm25
+from app.query import RERANK_DEPTH, LegalSearcher, compose_answer
+
+GOLD_FILE = "bench/gold.jsonl"
+STAGES = ["encode", "query", "rerank", "compose", "total"]
+
+
+def load_gold(path: str = GOLD_FILE) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(searcher: LegalSearcher, gold: List[Dict], top_k: int) -> Dict:
+    """Recall@k, MRR y percentiles (ms) de cada etapa para una configuración del buscador."""
+    hits, reciprocal_ranks = [], []
+    samples: Dict[str, List[float]] = {name: [] for name in STAGES}
+    for item in gold:
+        searcher.embed_cache.clear()
+        timings: Dict[str, float] = {}
+        start = time.perf_counter()
+        results = searcher.search(item["question"], top_k=top_k, source=item["law"], timings=timings)
+        compose_start = time.perf_counter()
+        compose_answer(results, item["question"])
+        end = time.perf_counter()
+        timings["compose"] = end - compose_start
+        timings["total"] = end - start
+        for name in STAGES:
+            samples[name].append(timings.get(name, 0.0) * 1000)
+
+        expected = {base_article(a) for a in item["articles"]}
+        ranks = [i for i, r in enumerate(results) if base_article(r.get("article_number")) in expected]
+        hits.append(1.0 if ranks else 0.0)
+        reciprocal_ranks.append(1.0 / (ranks[0] + 1) if ranks else 0.0)
+
+    return {
+        "recall": float(np.mean(hits)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "latency_ms": {
+            name: dict(zip(("p50", "p95", "p99"), np.percentile(values, [50, 95, 99]).tolist()))
+            for name, values in samples.items()
+        },
+    }
+
+
+def evaluate_version(version: Optional[str], model, reranker, gold: List[Dict], top_k: int) -> Dict:
+    """
+    Métricas del gold sobre una versión del índice con la configuración de la API
+    (híbrido si hay BM25, RERANK_DEPTH). El modelo y el reranker se reciben ya
+    cargados para compartirlos entre versiones.
+    """
+    searcher = LegalSearcher(
+        init_index(version), model, bm25=load_bm25(index_root(version)),
+        rerank_depth=RERANK_DEPTH, reranker=reranker,
+    )
+    return evaluate(searcher, gold, top_k)
@@ -1,21 +1,65 @@
 import os
+import queue
+import re
+import threading
+import time
+import unicodedata
+import uuid
 from dotenv import load_dotenv
 from pinecone import Pinecone, ServerlessSpec
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from app.chunking import article_header, chunk_by_tokens, truncated_tokens
+from app.manifest import chunk_hash
+from app.runtime import build_embedder
 
 load_dotenv()
 
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "legal-assistant")
 
+# 🔹 Backend del índice vectorial: "pinecone" (remoto) o "local" (embebido, sin red)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone").lower()
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "index_data")
+# Escaneo sobre códigos compactos en el índice local: "none", "int8" o "binary",
+# con PCA opcional a LOCAL_PCA_DIM dimensiones y re-puntuación de LOCAL_RESCORE * top_k candidatos
+LOCAL_QUANTIZATION = os.getenv("LOCAL_QUANTIZATION", "none").lower()
+LOCAL_PCA_DIM = int(os.getenv("LOCAL_PCA_DIM", "0"))
+LOCAL_RESCORE = int(os.getenv("LOCAL_RESCORE", "4"))
+# Filas candidatas hasta las que la consulta escanea en exacto en vez de recorrer el grafo HNSW
+LOCAL_EXACT_ROWS = int(os.getenv("LOCAL_EXACT_ROWS", "20000"))
+EMBEDDING_MODEL = "multi-qa-MiniLM-L6-cos-v1"
+EMBEDDING_DIM = 384
+
+# 🔹 Pipeline de indexación: lotes del encoder y lotes/hilos de upsert
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+UPSERT_WORKERS = int(os.getenv("UPSERT_WORKERS", "4"))
+DELETE_BATCH_SIZE = 1000  # máximo de ids por delete en Pinecone
+
+# 🔹 Chunker: "tokens" (cabe en la ventana del modelo) o "chars" (3000 caracteres, el histórico)
+CHUNKER = os.getenv("CHUNKER", "tokens").lower()
+# El modelo acepta 512 tokens pero se entrenó con textos de hasta ~250
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "256"))
+
+# 🔹 Versión del índice: run_index.py la cambia al terminar y la API vacía sus cachés.
+# Es también el alias de la re-indexación blue/green: si existe VERSIONS_DIR/<versión>,
+# ahí están índice local (o el namespace de Pinecone con ese nombre), BM25, tabla de
+# artículos y manifiesto de la versión activa; si no, en LOCAL_INDEX_DIR directamente.
+INDEX_VERSION_FILE = os.getenv("INDEX_VERSION_FILE", os.path.join(LOCAL_INDEX_DIR, "VERSION"))
+VERSIONS_DIR = os.path.join(LOCAL_INDEX_DIR, "versions")
+
+# 🔹 Índice léxico BM25 (búsqueda híbrida), construido por run_index.py. Desactivada por
+# defecto: cambia el ranking y se activa sólo tras comparar denso vs. híbrido con
+# `python -m bench.retrieval` sobre el gold (run_index.py construye el BM25 igual)
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "0") == "1"
+
 def init_pinecone():
     pc = Pinecone(api_key=PINECONE_API_KEY)
 
     if INDEX_NAME not in pc.list_indexes().names():
         pc.create_index(
             name=INDEX_NAME,
-            dimension=384,
+            dimension=EMBEDDING_DIM,
             metric="cosine",
             spec=ServerlessSpec(
                 cloud="aws",
@@ -26,14 +70,145 @@ def init_pinecone():
 
     return pc.Index(INDEX_NAME)
 
+class NamespacedIndex:
+    """Un namespace de un índice de Pinecone con la misma interfaz que el índice completo."""
+
+    def __init__(self, index, namespace: str):
+        self.index = index
+        self.namespace = namespace
+
+    def query(self, **kwargs):
+        return self.index.query(namespace=self.namespace, **kwargs)
+
+    def upsert(self, vectors):
+        return self.index.upsert(vectors=vectors, namespace=self.namespace)
+
+    def delete(self, ids=None, delete_all: bool = False):
+        if delete_all:
+            return self.index.delete(delete_all=True, namespace=self.namespace)
+        return self.index.delete(ids=ids, namespace=self.namespace)
+
+    def fetch(self, ids):
+        return self.index.fetch(ids=ids, namespace=self.namespace)
+
+    def list(self):
+        return self.index.list(namespace=self.namespace)
+
+def index_root(version: Optional[str] = None) -> str:
+    """Carpeta de una versión del índice (por defecto la activa); LOCAL_INDEX_DIR si no es blue/green."""
+    version = read_index_version() if version is None else version
+    path = os.path.join(VERSIONS_DIR, version) if version else ""
+    return path if path and os.path.isdir(path) else LOCAL_INDEX_DIR
+
+def bm25_dir(root: Optional[str] = None) -> str:
+    return os.path.join(root or index_root(), "bm25")
+
+def articles_dir(root: Optional[str] = None) -> str:
+    """Tabla (ley, artículo) -> chunks para responder "¿qué dice el artículo N?" sin embeddings."""
+    return os.path.join(root or index_root(), "articles")
+
+def init_local_index(path: str = LOCAL_INDEX_DIR):
+    from app.local_index import LocalIndex
+    index = LocalIndex(
+        path,
+        dimension=EMBEDDING_DIM,
+        quantization=None if LOCAL_QUANTIZATION == "none" else LOCAL_QUANTIZATION,
+        pca_dim=LOCAL_PCA_DIM,
+        rescore=LOCAL_RESCORE,
+        exact_rows=LOCAL_EXACT_ROWS,
+    )
+    print(f"✅ Índice local cargado desde '{path}' ({len(index)} vectores).")
+    return index
+
+def init_index(version: Optional[str] = None):
+    """
+    Devuelve el índice configurado en VECTOR_BACKEND (misma interfaz upsert/query)
+    de una versión (por defecto la activa).
+    """
+    root = index_root(version)
+    if VECTOR_BACKEND == "local":
+        return init_local_index(root)
+    if VECTOR_BACKEND != "pinecone":
+        raise ValueError(f"VECTOR_BACKEND desconocido: {VECTOR_BACKEND}")
+    if root == LOCAL_INDEX_DIR:
+        return init_pinecone()
+    return NamespacedIndex(init_pinecone(), os.path.basename(root))
+
+def load_bm25(root: Optional[str] = None):
+    """Índice BM25 para la búsqueda híbrida, o None si está desactivada o no se ha construido."""
+    if not HYBRID_SEARCH:
+        return None
+    from app.bm25 import BM25Index
+    bm25 = BM25Index.load(bm25_dir(root))
+    if bm25 is not None:
+        print(f"✅ Índice BM25 cargado ({len(bm25)} chunks).")
+    return bm25
+
+def load_article_lookup(root: Optional[str] = None):
+    from app.article_lookup import ArticleLookup
+    lookup = ArticleLookup.load(articles_dir(root))
+    if lookup is not None:
+        print(f"✅ Tabla de artículos cargada ({len(lookup)} artículos).")
+    return lookup
+
+def flush_index(index):
+    """Persiste el índice local en disco; en Pinecone los datos ya están en remoto."""
+    if hasattr(index, "save"):
+        index.save()
+
+def read_index_version() -> str:
+    try:
+        with open(INDEX_VERSION_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def read_index_generation() -> Tuple[str, int]:
+    """
+    (versión activa, mtime del alias). Cambia también cuando run_index.py --in-place
+    vuelve a publicar la misma versión tras actualizarla en el sitio.
+    """
+    try:
+        # El mtime antes que la versión: si el alias cambia entre medias, la próxima lectura lo detecta
+        stamp = os.stat(INDEX_VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return "", 0
+    return read_index_version(), stamp
+
+def new_version_id() -> str:
+    return f"{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def bump_index_version(version: Optional[str] = None) -> str:
+    """Publica `version` (o una nueva) en el archivo VERSION con un reemplazo atómico."""
+    version = version or new_version_id()
+    directory = os.path.dirname(INDEX_VERSION_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{INDEX_VERSION_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, INDEX_VERSION_FILE)
+    return version
+
+def manifest_path(root: Optional[str] = None) -> str:
+    """Manifiesto de re-indexación incremental, uno por backend/índice (y versión)."""
+    root = root or index_root()
+    if VECTOR_BACKEND == "local":
+        return os.path.join(root, "manifest.sqlite")
+    return os.path.join(root, f"manifest-pinecone-{INDEX_NAME}.sqlite")
+
 def build_embeddings_model():
-    # Modelo optimizado para QA
-    return SentenceTransformer("multi-qa-MiniLM-L6-cos-v1")
+    # Modelo optimizado para QA (PyTorch u ONNX según MODEL_RUNTIME)
+    return build_embedder(EMBEDDING_MODEL)
+
+def source_key(source_name: str) -> str:
+    """Clave estable de una ley: sin tildes, minúsculas y sólo alfanuméricos."""
+    text = unicodedata.normalize("NFKD", source_name)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]", "", text.lower())
 
 def build_text_for_embedding(article: Dict) -> str:
-    title = article.get("title", "")
-    body = article.get("body", "")
-    return f"Artículo {article['article_number']}: {title}\n{body}"
+    return article_header(article) + article.get("body", "")
 
 def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[str]:
     """
@@ -49,25 +224,147 @@ def chunk_text(text: str, chunk_size: int = 2000, overlap: int = 200) -> List[st
         start += chunk_size - overlap
     return chunks
 
-def upsert_articles(index, model, articles: List[Dict], source_name: str):
-    to_upsert = []
-    for a in articles:
-        text = build_text_for_embedding(a)
+def chunk_window(model) -> int:
+    return min(CHUNK_MAX_TOKENS, model.max_seq_length)
 
-        # 🔹 Dividir en chunks si es demasiado largo
-        chunks = chunk_text(text, chunk_size=3000, overlap=300)
+def chunk_article(article: Dict, model=None) -> List[str]:
+    """Chunks de un artículo: por tokens del modelo si hay tokenizer, si no por caracteres."""
+    if CHUNKER == "tokens" and model is not None:
+        return chunk_by_tokens(article_header(article), article.get("body", ""), model.tokenizer, chunk_window(model))
+    return chunk_text(build_text_for_embedding(article), chunk_size=3000, overlap=300)
 
-        for i, chunk in enumerate(chunks):
-            vec = model.encode(chunk).tolist()
+def truncation_report(model, chunks: List[Tuple[str, str, Dict]]) -> Tuple[int, int]:
+    """(tokens totales, tokens truncados por el modelo) de chunks ya construidos."""
+    return truncated_tokens(model.tokenizer, [text for _, text, _ in chunks], model.max_seq_length)
+
+def build_chunks(articles: List[Dict], source_name: str, model=None) -> List[Tuple[str, str, Dict]]:
+    """
+    Devuelve (id, texto, metadata) por cada chunk de cada artículo. Pasar el
+    modelo de embeddings activa el chunker por tokens (CHUNKER=tokens).
+    """
+    chunks = []
+    seen: Dict[str, int] = {}
+    for a in articles:
+        # 🔹 Un id de artículo repetido (p. ej. "artículo 95 de este Código" tomado como
+        # encabezado) recibe un sufijo por aparición: vectores, BM25 y tabla de artículos
+        # guardan así los mismos textos bajo los mismos ids, sin mezclar chunks de dos artículos
+        seen[a["id"]] = occurrence = seen.get(a["id"], 0) + 1
+        article_id = a["id"] if occurrence == 1 else f"{a['id']}#{occurrence}"
+        for i, chunk in enumerate(chunk_article(a, model)):
             metadata = {
                 "article_number": a["article_number"],
                 "title": a.get("title", ""),
                 "text": chunk,  # ✅ cada chunk limitado
                 "source": source_name,
+                "source_key": source_key(source_name),  # para filtrar por ley en la consulta
             }
-            # ID único por chunk
-            vector_id = f"{a['id']}_chunk{i}"
-            to_upsert.append((vector_id, vec, metadata))
+            if occurrence > 1:
+                metadata["occurrence"] = occurrence
+            # ID único por chunk (con la ley: art_1 existe en todos los códigos)
+            chunks.append((f"{source_key(source_name)}:{article_id}_chunk{i}", chunk, metadata))
+    return chunks
+
+def encode_batches(model, chunks: List[Tuple[str, str, Dict]], batch_size: int = EMBED_BATCH_SIZE):
+    """
+    Embebe los chunks en lotes ordenados por longitud (menos padding por lote)
+    y va entregando (id, vector, metadata) a medida que termina cada lote.
+    """
+    order = sorted(range(len(chunks)), key=lambda i: len(chunks[i][1]))
+    for start in range(0, len(order), batch_size):
+        batch = [chunks[i] for i in order[start:start + batch_size]]
+        vecs = model.encode([text for _, text, _ in batch], batch_size=batch_size)
+        for (vector_id, _, metadata), vec in zip(batch, vecs):
+            yield vector_id, vec.tolist(), metadata
+
+def upsert_vectors(
+    index,
+    vectors,
+    batch_size: int = UPSERT_BATCH_SIZE,
+    workers: int = UPSERT_WORKERS,
+) -> int:
+    """
+    Envía los vectores en lotes de tamaño fijo mediante un pool pequeño de hilos.
+    La cola es acotada: si la red va lenta, el productor (el encoder) espera.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=2 * workers)
+    errors: List[Exception] = []
+
+    def sender():
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            try:
+                index.upsert(vectors=batch)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+
+    total = 0
+    pending = []
+    try:
+        for item in vectors:
+            pending.append(item)
+            if len(pending) >= batch_size:
+                batches.put(pending)
+                total += len(pending)
+                pending = []
+            if errors:
+                break
+        if pending and not errors:
+            batches.put(pending)
+            total += len(pending)
+    finally:
+        for _ in threads:
+            batches.put(None)
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return total
+
+def delete_vectors(index, ids: List[str]):
+    for start in range(0, len(ids), DELETE_BATCH_SIZE):
+        index.delete(ids=ids[start:start + DELETE_BATCH_SIZE])
+
+def upsert_articles(
+    index, model, articles: List[Dict], source_name: str, manifest=None, full: bool = False,
+    chunks: Optional[List[Tuple[str, str, Dict]]] = None,
+) -> Dict:
+    """
+    Indexa los artículos de una ley. Con un manifiesto (app.manifest.IndexManifest)
+    sólo embebe los chunks nuevos o modificados (todos si full=True) y borra los
+    ids que ya no existen tras una reforma. Si ya se tienen los chunks de
+    build_chunks, pasarlos en `chunks` evita volver a trocear la ley.
+    """
+    start = time.perf_counter()
+    if chunks is None:
+        chunks = build_chunks(articles, source_name, model)
+
+    deleted: List[str] = []
+    hashes: Dict[str, str] = {}
+    if manifest is not None:
+        previous = manifest.chunk_hashes(source_name)
+        hashes = {cid: chunk_hash(text, meta, EMBEDDING_MODEL) for cid, text, meta in chunks}
+        if not full:
+            chunks = [c for c in chunks if previous.get(c[0]) != hashes[c[0]]]
+        deleted = sorted(set(previous) - set(hashes))
+
+    total = upsert_vectors(index, encode_batches(model, chunks))
+    delete_vectors(index, deleted)
+
+    if manifest is not None:
+        manifest.update_chunks(source_name, {cid: hashes[cid] for cid, _, _ in chunks}, deleted)
+    elapsed = time.perf_counter() - start
 
-    index.upsert(vectors=to_upsert)
-    print(f"✅ {source_name} insertada en Pinecone con {len(to_upsert)} vectores")
\ No newline at end of file
+    print(f"✅ {source_name}: {total} vectores insertados/actualizados, {len(deleted)} eliminados")
+    return {
+        "vectors": total,
+        "deleted": len(deleted),
+        "seconds": elapsed,
+        "vectors_per_second": total / elapsed if elapsed > 0 else 0.0,
+    }
\ No newline at end of file
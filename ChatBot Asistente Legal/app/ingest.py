@@ -1,14 +1,64 @@
 from PyPDF2 import PdfReader
+from concurrent.futures import Executor, ProcessPoolExecutor
+import bisect
+import gzip
+import hashlib
+import json
+import math
+import os
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
-def extract_text_from_pdf(path: str) -> str:
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = 10  # mínimo de páginas por tarea para que compense lanzar procesos
+
+# 🔹 Caché de extracción por hash del PDF. Subir la versión si cambia
+# normalize_text o split_by_articles de forma que altere la salida.
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", os.path.join(".cache", "extraction"))
+EXTRACTION_CACHE_VERSION = 1
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    # Cada proceso abre su propio lector: los objetos de PyPDF2 no se pueden enviar entre procesos
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def extract_text_from_pdf(path: str, workers: Optional[int] = None, pool: Optional[Executor] = None) -> str:
+    """
+    Extrae el texto página por página. Con más de un worker (o un pool de procesos
+    compartido) reparte rangos de páginas entre procesos y junta los resultados en orden.
+    """
     reader = PdfReader(path)
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text() or ""
-        text += page_text + "\n"
-    return text
+    n_pages = len(reader.pages)
+    workers = workers or PDF_WORKERS
+
+    if pool is None and (workers <= 1 or n_pages <= PAGES_PER_TASK):
+        pages = [page.extract_text() or "" for page in reader.pages]
+        return "".join(p + "\n" for p in pages)
+
+    # Varios rangos por worker para repartir bien la carga (hay páginas más densas que otras)
+    step = max(PAGES_PER_TASK, math.ceil(n_pages / (4 * workers)))
+    starts = list(range(0, n_pages, step))
+    ends = [min(s + step, n_pages) for s in starts]
+
+    pages: List[str] = []
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # map() entrega los rangos en orden a medida que terminan
+        for chunk in pool.map(_extract_page_range, [path] * len(starts), starts, ends):
+            pages.extend(chunk)
+    finally:
+        if own_pool:
+            pool.shutdown()
+    return "".join(p + "\n" for p in pages)
 
 def normalize_text(text: str) -> str:
     text = re.sub(r'\r', '\n', text)
@@ -16,35 +66,68 @@ def normalize_text(text: str) -> str:
     text = re.sub(r'\n{2,}', '\n', text)
     return text.strip()
 
-def split_by_articles(text: str) -> List[Dict]:
-    pattern = r'(?i)(?:\n|^)(artículo|art\.)\s+(\d+)[\.\-–:]?\s*(.*?)(?=\n(?:artículo|art\.)\s+\d+|$)'
-    matches = re.finditer(pattern, text, flags=re.DOTALL)
+# 🔹 Segmentador en una sola pasada: se buscan todos los encabezados una vez y
+# cada sección se corta por offsets, en lugar de un `.*?` con lookahead que
+# vuelve a recorrer el resto del texto por cada artículo.
+ARTICLE_HEADER = re.compile(r'(artículo|art\.)\s+(\d+)[\.\-–:]?\s*', re.IGNORECASE)
+ARTICLE_BOUNDARY = re.compile(r'\n(?:artículo|art\.)\s+\d+', re.IGNORECASE)
+INCISO_HEADER = re.compile(r'([a-h])\.\s*')
+INCISO_BOUNDARY = re.compile(r'\n[a-h]\.')
 
+def _sections(text: str, header: re.Pattern, boundary: re.Pattern, at_start: bool) -> List[Tuple[re.Match, str]]:
+    """
+    (encabezado, contenido) de cada sección. Una sección empieza en un salto de
+    línea seguido de `header` (o al inicio del texto si `at_start`) y su contenido
+    llega hasta el siguiente límite posterior al encabezado o al final del texto.
+    """
+    starts = [m.start() for m in boundary.finditer(text)]
+    # `$` sin MULTILINE también coincide antes de un salto de línea final
+    end_of_text = len(text) - 1 if text.endswith("\n") else len(text)
+
+    heads = [header.match(text, s + 1) for s in starts]
+    if at_start and (not starts or starts[0] != 0):
+        first = header.match(text, 0)
+        if first:
+            starts.insert(0, 0)
+            heads.insert(0, first)
+
+    sections = []
+    i = 0
+    while i < len(starts):
+        head = heads[i]
+        body_start = head.end()
+        # Primer límite que empieza después del encabezado (los que caen dentro de su espacio en blanco no cuentan)
+        j = bisect.bisect_left(starts, body_start, lo=i + 1)
+        if j < len(starts):
+            end = starts[j]
+        else:
+            end = end_of_text if body_start <= end_of_text else len(text)
+        sections.append((head, text[body_start:end]))
+        i = j
+    return sections
+
+def split_by_articles(text: str) -> List[Dict]:
     articles = []
-    for m in matches:
-        number = m.group(2)
-        maybe_title = m.group(3).strip()
+    for head, maybe_title in _sections(text, ARTICLE_HEADER, ARTICLE_BOUNDARY, at_start=True):
+        number = head.group(2)
+        maybe_title = maybe_title.strip()
         parts = maybe_title.split("\n", 1)
         title = parts[0].strip()
         body = parts[1].strip() if len(parts) > 1 else ""
 
         # 🔹 Detectar incisos dentro del cuerpo
-        inciso_pattern = r'\n([a-h])\.\s*(.*?)(?=\n[a-h]\.|$)'
-        incisos = re.finditer(inciso_pattern, body, flags=re.DOTALL)
+        incisos = _sections(body, INCISO_HEADER, INCISO_BOUNDARY, at_start=False)
 
-        found = False
-        for inciso in incisos:
-            found = True
+        for inciso, texto in incisos:
             letra = inciso.group(1)
-            texto = inciso.group(2).strip()
             articles.append({
                 "id": f"art_{number}_{letra}",
                 "article_number": f"{number}.{letra}",
                 "title": f"{title} — Principio {letra}",
-                "body": texto
+                "body": texto.strip()
             })
 
-        if not found:
+        if not incisos:
             articles.append({
                 "id": f"art_{number}",
                 "article_number": number,
@@ -54,9 +137,51 @@ def split_by_articles(text: str) -> List[Dict]:
 
     return articles
 
-def load_legal_articles(pdf_path: str) -> List[Dict]:
-    raw = extract_text_from_pdf(pdf_path)
+def _cache_path(pdf_hash: str) -> str:
+    return os.path.join(EXTRACTION_CACHE_DIR, f"{pdf_hash}-v{EXTRACTION_CACHE_VERSION}.jsonl.gz")
+
+def read_extraction_cache(pdf_hash: str) -> Optional[Tuple[str, List[Dict]]]:
+    """Devuelve (texto normalizado, artículos) si el PDF ya fue procesado."""
+    path = _cache_path(pdf_hash)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            articles = [json.loads(line) for line in f]
+    except (OSError, ValueError, EOFError):
+        return None  # caché corrupta: se vuelve a extraer
+    return header["text"], articles
+
+def write_extraction_cache(pdf_hash: str, text: str, articles: List[Dict]):
+    """Primera línea: texto normalizado; luego un artículo por línea (JSONL comprimido)."""
+    os.makedirs(EXTRACTION_CACHE_DIR, exist_ok=True)
+    path = _cache_path(pdf_hash)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+        for a in articles:
+            f.write(json.dumps(a, ensure_ascii=False) + "\n")
+    os.replace(tmp, path)
+
+def load_extraction(
+    pdf_path: str, pool: Optional[Executor] = None, use_cache: bool = True
+) -> Tuple[str, List[Dict]]:
+    """Texto normalizado y artículos de un PDF, usando la caché por hash de contenido."""
+    pdf_hash = file_sha256(pdf_path)
+    if use_cache:
+        cached = read_extraction_cache(pdf_hash)
+        if cached is not None:
+            return cached
+
+    raw = extract_text_from_pdf(pdf_path, pool=pool)
     norm = normalize_text(raw)
     articles = split_by_articles(norm)
+    if use_cache:
+        write_extraction_cache(pdf_hash, norm, articles)
+    return norm, articles
+
+def load_legal_articles(pdf_path: str, pool: Optional[Executor] = None, use_cache: bool = True) -> List[Dict]:
+    _, articles = load_extraction(pdf_path, pool=pool, use_cache=use_cache)
     print(f"✅ {len(articles)} artículos extraídos de {pdf_path}")
     return articles
\ No newline at end of file
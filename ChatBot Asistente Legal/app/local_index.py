@@ -0,0 +1,697 @@
+"""
+Índice vectorial local (sin red) con la misma interfaz que usamos de Pinecone:
+``upsert(vectors=...)``, ``query(vector, top_k, include_metadata, filter)`` y
+``delete(ids=...)``.
+
+Los vectores se guardan normalizados en una matriz float32 (``vectors.npy``)
+que se abre con memory-map, y la búsqueda aproximada recorre un grafo HNSW.
+
+Con pocas filas candidatas (índice pequeño o filtro por metadata selectivo) el
+recorrido del grafo en Python cuesta más que un producto matricial sobre esas
+filas, así que la consulta va directamente al escaneo exacto.
+
+Con ``quantization`` ("int8" o "binary") y/o ``pca_dim`` la búsqueda aproximada
+escanea en cambio códigos compactos en RAM (``codes.npy``) y vuelve a puntuar
+los ``rescore * top_k`` mejores con los vectores float32 del memory-map.
+"""
+import heapq
+import json
+import math
+import os
+import random
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.quantization import VectorCodec
+
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.jsonl"
+GRAPH_FILE = "graph.json"
+CODES_FILE = "codes.npy"
+CODEC_FILE = "codec.npz"
+FILTER_CACHE_SIZE = 64  # filtros distintos (uno por ley) cuyas filas se recuerdan
+QUERY_BLOCK = 16  # consultas por producto matricial en query_many (acota la matriz de scores)
+# Hasta cuántas filas candidatas (vivas y que cumplen el filtro) se escanea en exacto en vez
+# de recorrer el grafo, y fracción del índice por debajo de la cual un filtro se resuelve en exacto
+EXACT_SCAN_ROWS = 20000
+EXACT_FILTER_RATIO = 0.2
+
+# Si más de esta fracción de filas está borrada, el grafo se reconstruye al guardar
+COMPACT_RATIO = 0.3
+
+
+class Match:
+    """Resultado de una consulta, con los atributos de un match de Pinecone."""
+
+    def __init__(self, id: str, score: float, metadata: Optional[Dict] = None):
+        self.id = id
+        self.score = score
+        self.metadata = metadata
+
+
+class QueryResponse:
+    def __init__(self, matches: List[Match]):
+        self.matches = matches
+
+
+def matches_filter(metadata: Dict, flt: Optional[Dict]) -> bool:
+    """Evalúa un filtro de metadata con la sintaxis de Pinecone ($eq, $ne, $in, $nin, $and, $or)."""
+    if not flt:
+        return True
+    for key, cond in flt.items():
+        if key == "$and":
+            if not all(matches_filter(metadata, c) for c in cond):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_filter(metadata, c) for c in cond):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, expected in cond.items():
+            if op == "$eq":
+                ok = value == expected
+            elif op == "$ne":
+                ok = value != expected
+            elif op == "$in":
+                ok = value in expected
+            elif op == "$nin":
+                ok = value not in expected
+            else:
+                raise ValueError(f"Operador de filtro no soportado: {op}")
+            if not ok:
+                return False
+    return True
+
+
+def _normalize(vec) -> np.ndarray:
+    v = np.asarray(vec, dtype=np.float32)
+    norm = np.linalg.norm(v, axis=-1, keepdims=True)
+    return v / np.maximum(norm, 1e-12)
+
+
+class LocalIndex:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dimension: Optional[int] = None,
+        m: int = 16,
+        ef_construction: int = 100,
+        ef_search: int = 64,
+        seed: int = 42,
+        quantization: Optional[str] = None,
+        pca_dim: int = 0,
+        rescore: int = 4,
+        exact_rows: int = EXACT_SCAN_ROWS,
+    ):
+        self.path = path
+        self.dimension = dimension
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.exact_rows = exact_rows
+        self._ml = 1 / math.log(m)
+        self._rng = random.Random(seed)
+        self._lock = threading.RLock()
+
+        # 🔹 Matriz de vectores (memmap al cargar, RAM en cuanto se escribe)
+        self._data = np.zeros((0, dimension or 0), dtype=np.float32)
+        self._count = 0
+        self._vectors_dirty = False
+        self._dirty = False
+
+        # 🔹 Filas: id, metadata y borrados lógicos
+        self._ids: List[str] = []
+        self._metadata: List[Dict] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._deleted: set = set()
+        self._filter_rows: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+        # 🔹 Grafo HNSW: nivel de cada nodo y vecinos por capa
+        self._levels: List[int] = []
+        self._neighbors: List[List[List[int]]] = []
+        self._entry: Optional[int] = None
+        self._max_level = -1
+
+        # 🔹 Códigos cuantizados (opcionales): se calculan al primer uso y se guardan con save()
+        self.configure_quantization(quantization, pca_dim, rescore)
+
+        if path and os.path.exists(os.path.join(path, VECTORS_FILE)):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def configure_quantization(self, quantization: Optional[str] = None, pca_dim: int = 0, rescore: int = 4):
+        """Activa (o desactiva, con None y pca_dim=0) el escaneo sobre códigos compactos."""
+        with self._lock:
+            kind = quantization or ("float32" if pca_dim else None)
+            self.quantization = kind
+            self.pca_dim = pca_dim
+            self.rescore = rescore
+            self._codec: Optional[VectorCodec] = None
+            self._codes: Optional[np.ndarray] = None
+            self._codes_dirty = False
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes de la matriz float32 completa y de los códigos que se escanean en RAM."""
+        return {
+            "vectors": self._count * (self.dimension or 0) * 4,
+            "codes": 0 if self._codes is None else self._codes.nbytes,
+        }
+
+    # ------------------------------------------------------------------
+    # Interfaz compatible con Pinecone
+    # ------------------------------------------------------------------
+    def upsert(self, vectors: Iterable, namespace: Optional[str] = None) -> Dict:
+        items = [self._parse_vector(v) for v in vectors]
+        if not items:
+            return {"upserted_count": 0}
+
+        with self._lock:
+            matrix = _normalize([values for _, values, _ in items])
+            if self.dimension is None:
+                self.dimension = matrix.shape[1]
+            if matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Dimensión {matrix.shape[1]} no coincide con la del índice ({self.dimension})"
+                )
+
+            self._ensure_capacity(len(items))
+            for (vector_id, _, metadata), vec in zip(items, matrix):
+                # Un id existente se reemplaza: la fila vieja queda como borrado lógico
+                old = self._id_to_row.get(vector_id)
+                if old is not None:
+                    self._deleted.add(old)
+
+                row = self._count
+                self._data[row] = vec
+                self._count += 1
+                self._ids.append(vector_id)
+                self._metadata.append(metadata or {})
+                self._id_to_row[vector_id] = row
+                self._insert(row)
+
+            self._vectors_dirty = True
+            self._dirty = True
+        return {"upserted_count": len(items)}
+
+    def query(
+        self,
+        vector,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        filter: Optional[Dict] = None,
+        namespace: Optional[str] = None,
+        include_values: bool = False,
+        exact: bool = False,
+        ef: Optional[int] = None,
+    ) -> QueryResponse:
+        if self._entry is None or top_k <= 0:
+            return QueryResponse([])
+
+        q = _normalize(vector)
+        if exact:
+            hits = self._exact_search(q, top_k, filter)
+        elif self.quantization:
+            hits = self._quantized_search(q, top_k, filter)
+        elif self._prefers_exact(filter):
+            hits = self._exact_search(q, top_k, filter)
+        else:
+            hits = self._hnsw_search(q, top_k, filter, ef or self.ef_search)
+            # Filtros muy selectivos pueden dejar pocos resultados en el grafo
+            if len(hits) < top_k and (filter or self._deleted):
+                hits = self._exact_search(q, top_k, filter)
+
+        matches = []
+        for score, row in hits:
+            metadata = dict(self._metadata[row]) if include_metadata else None
+            matches.append(Match(self._ids[row], float(score), metadata))
+        return QueryResponse(matches)
+
+    def query_many(
+        self,
+        vectors,
+        top_k: int = 10,
+        include_metadata: bool = False,
+        filter: Optional[Dict] = None,
+        exact: bool = False,
+        ef: Optional[int] = None,
+    ) -> List[QueryResponse]:
+        """
+        Varias consultas con el mismo filtro (p. ej. todas las de una ley); mismo
+        resultado que llamar a query() con cada una. La búsqueda exacta recorre
+        la matriz una vez por bloque de consultas (también cuando la elige
+        _prefers_exact); HNSW y códigos van una a una.
+        """
+        if self._entry is not None and not self.quantization:
+            exact = exact or self._prefers_exact(filter)
+        if not exact or self._entry is None or top_k <= 0:
+            return [self.query(v, top_k, include_metadata, filter, exact=exact, ef=ef) for v in vectors]
+
+        responses = []
+        queries = _normalize(np.atleast_2d(vectors))
+        for start in range(0, len(queries), QUERY_BLOCK):
+            scores = self._data[: self._count] @ queries[start:start + QUERY_BLOCK].T
+            for column in scores.T:
+                hits = self._top_rows(column, top_k, filter)
+                responses.append(QueryResponse([
+                    Match(self._ids[row], float(score), dict(self._metadata[row]) if include_metadata else None)
+                    for score, row in hits
+                ]))
+        return responses
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        delete_all: bool = False,
+        namespace: Optional[str] = None,
+        filter: Optional[Dict] = None,
+    ) -> Dict:
+        with self._lock:
+            if delete_all:
+                rows = list(self._id_to_row.values())
+            elif filter:
+                rows = [r for r in self._id_to_row.values() if matches_filter(self._metadata[r], filter)]
+            else:
+                rows = [self._id_to_row[i] for i in ids or [] if i in self._id_to_row]
+
+            for row in rows:
+                self._deleted.add(row)
+                del self._id_to_row[self._ids[row]]
+            if rows:
+                self._dirty = True
+        return {}
+
+    def describe_index_stats(self) -> Dict:
+        return {"dimension": self.dimension, "total_vector_count": len(self)}
+
+    def export(self) -> Tuple[List[str], np.ndarray, List[Dict]]:
+        """Ids, vectores (normalizados) y metadata de las filas vivas, en orden de inserción."""
+        with self._lock:
+            rows = sorted(self._id_to_row.values())
+            vectors = np.array(self._data[rows], dtype=np.float32).reshape(len(rows), self.dimension or 0)
+            return [self._ids[r] for r in rows], vectors, [self._metadata[r] for r in rows]
+
+    def export_graph(self) -> Optional[Dict]:
+        """
+        Grafo HNSW cuyos nodos son las filas de export(); None si hay borrados
+        lógicos, porque entonces la numeración de filas no coincide.
+        """
+        with self._lock:
+            return None if self._deleted else json.loads(json.dumps(self._graph_state()))
+
+    def load_exported(self, ids: List[str], vectors, metadata: List[Dict], graph: Dict):
+        """Carga en un índice vacío filas y grafo exportados, sin reconstruir el HNSW."""
+        with self._lock:
+            if self._ids:
+                raise ValueError("load_exported sólo se puede usar con un índice vacío")
+            if len(graph["levels"]) != len(ids):
+                raise ValueError("El grafo no corresponde a los vectores exportados")
+            self._data = _normalize(vectors).reshape(len(ids), graph["dimension"])
+            self._count = len(ids)
+            self._ids = list(ids)
+            self._metadata = [meta or {} for meta in metadata]
+            self._id_to_row = {vector_id: row for row, vector_id in enumerate(self._ids)}
+            self.dimension = graph["dimension"]
+            self._restore_graph(graph)
+            self._codec, self._codes = None, None
+            self._filter_rows.clear()
+            self._vectors_dirty = True
+            self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                self._save_codes()
+                return
+            if self._deleted and len(self._deleted) > COMPACT_RATIO * self._count:
+                self._compact()
+
+            os.makedirs(self.path, exist_ok=True)
+            if self._vectors_dirty:
+                tmp = os.path.join(self.path, VECTORS_FILE + ".tmp")
+                with open(tmp, "wb") as f:
+                    np.save(f, self._data[: self._count])
+                os.replace(tmp, os.path.join(self.path, VECTORS_FILE))
+
+            tmp = os.path.join(self.path, METADATA_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for row, (vector_id, metadata) in enumerate(zip(self._ids, self._metadata)):
+                    record = {"id": vector_id, "metadata": metadata}
+                    if row in self._deleted:
+                        record["deleted"] = True
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            os.replace(tmp, os.path.join(self.path, METADATA_FILE))
+
+            tmp = os.path.join(self.path, GRAPH_FILE + ".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._graph_state(), f)
+            os.replace(tmp, os.path.join(self.path, GRAPH_FILE))
+
+            self._save_codes()
+
+            self._vectors_dirty = False
+            self._dirty = False
+
+    def _save_codes(self):
+        if not self.quantization:
+            return
+        codes = self._quantized_codes()
+        if not self._codes_dirty:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, CODES_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, codes)
+        os.replace(tmp, os.path.join(self.path, CODES_FILE))
+        tmp = os.path.join(self.path, CODEC_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, **self._codec.state())
+        os.replace(tmp, os.path.join(self.path, CODEC_FILE))
+        self._codes_dirty = False
+
+    def _load(self):
+        self._data = np.load(os.path.join(self.path, VECTORS_FILE), mmap_mode="r")
+        self._count = self._data.shape[0]
+        self.dimension = self._data.shape[1]
+
+        with open(os.path.join(self.path, METADATA_FILE), encoding="utf-8") as f:
+            for row, line in enumerate(f):
+                record = json.loads(line)
+                self._ids.append(record["id"])
+                self._metadata.append(record.get("metadata") or {})
+                if record.get("deleted"):
+                    self._deleted.add(row)
+                else:
+                    self._id_to_row[record["id"]] = row
+
+        with open(os.path.join(self.path, GRAPH_FILE), encoding="utf-8") as f:
+            self._restore_graph(json.load(f))
+
+        # Códigos guardados con la misma configuración: se evitan recalcular (y leer todos los vectores)
+        codec_path = os.path.join(self.path, CODEC_FILE)
+        if self.quantization and os.path.exists(codec_path):
+            with np.load(codec_path) as state:
+                codec = VectorCodec.from_state(state)
+            codes = np.load(os.path.join(self.path, CODES_FILE))
+            if codec.kind == self.quantization and codec.pca_dim == self.pca_dim and len(codes) == self._count:
+                self._codec, self._codes = codec, codes
+
+    def _graph_state(self) -> Dict:
+        return {
+            "dimension": self.dimension,
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "entry": self._entry,
+            "max_level": self._max_level,
+            "levels": self._levels,
+            "neighbors": self._neighbors,
+        }
+
+    def _restore_graph(self, graph: Dict):
+        self.m = graph["m"]
+        self.m0 = 2 * self.m
+        self._ml = 1 / math.log(self.m)
+        self.ef_construction = graph["ef_construction"]
+        self.ef_search = graph["ef_search"]
+        self._entry = graph["entry"]
+        self._max_level = graph["max_level"]
+        self._levels = graph["levels"]
+        self._neighbors = graph["neighbors"]
+
+    def _compact(self):
+        """Elimina las filas borradas y reconstruye el grafo con las vivas."""
+        live = sorted(self._id_to_row.values())
+        data = np.array(self._data[live], dtype=np.float32)
+        ids = [self._ids[r] for r in live]
+        metadata = [self._metadata[r] for r in live]
+
+        self._data = np.zeros((0, self.dimension), dtype=np.float32)
+        self._count = 0
+        self._ids, self._metadata = [], []
+        self._id_to_row, self._deleted = {}, set()
+        self._levels, self._neighbors = [], []
+        self._entry, self._max_level = None, -1
+        self._codes = None
+        self._filter_rows.clear()
+
+        self._ensure_capacity(len(live))
+        for vector_id, meta, vec in zip(ids, metadata, data):
+            row = self._count
+            self._data[row] = vec
+            self._count += 1
+            self._ids.append(vector_id)
+            self._metadata.append(meta)
+            self._id_to_row[vector_id] = row
+            self._insert(row)
+        self._vectors_dirty = True
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+    def _prefers_exact(self, flt: Optional[Dict]) -> bool:
+        """Si el escaneo exacto sale más barato que el grafo: pocas filas candidatas o filtro selectivo."""
+        live = len(self)
+        if live <= self.exact_rows:
+            return True
+        rows = self._accepted_rows(flt)
+        return rows is not None and (rows.size <= self.exact_rows or rows.size < EXACT_FILTER_RATIO * live)
+
+    def _exact_search(self, q: np.ndarray, top_k: int, flt: Optional[Dict]) -> List[Tuple[float, int]]:
+        rows = self._accepted_rows(flt)
+        if rows is not None and rows.size < self._count // 2:
+            # Filtro selectivo: sólo se puntúan (y se leen del memory-map) las filas que lo cumplen
+            if rows.size == 0:
+                return []
+            scores = np.asarray(self._data[rows], dtype=np.float32) @ q
+            k = min(top_k, rows.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(float(scores[i]), int(rows[i])) for i in top]
+        return self._top_rows(self._data[: self._count] @ q, top_k, flt)
+
+    def _quantized_search(self, q: np.ndarray, top_k: int, flt: Optional[Dict]) -> List[Tuple[float, int]]:
+        codes = self._quantized_codes()
+        candidates = self._top_rows(self._codec.scores(codes, q), top_k * self.rescore, flt)
+        if not candidates:
+            return []
+        # Re-puntuar con los vectores completos: sólo se leen estas filas del memory-map
+        rows = np.array(sorted(row for _, row in candidates), dtype=np.int64)
+        scores = np.asarray(self._data[rows], dtype=np.float32) @ q
+        order = np.argsort(-scores)[:top_k]
+        return [(float(scores[i]), int(rows[i])) for i in order]
+
+    def _quantized_codes(self) -> np.ndarray:
+        """Códigos de todas las filas; aprende el codec con los datos actuales si aún no existe."""
+        with self._lock:
+            if self._codec is None:
+                self._codec = VectorCodec.fit(self._data[: self._count], self.quantization, self.pca_dim)
+                self._codes = None
+            done = 0 if self._codes is None else len(self._codes)
+            if done < self._count:
+                # Por bloques, para no cargar todo el memory-map en RAM de una vez
+                new = [
+                    self._codec.encode(self._data[start:min(start + 65536, self._count)])
+                    for start in range(done, self._count, 65536)
+                ]
+                self._codes = np.concatenate(([self._codes] if self._codes is not None else []) + new)
+                self._codes_dirty = True
+            return self._codes
+
+    def _accepted(self, flt: Optional[Dict]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        (filas, máscara por fila) de las filas vivas que cumplen el filtro (None = todas);
+        el filtro se evalúa una vez y se recuerda hasta la próxima escritura.
+        """
+        if not flt and not self._deleted:
+            return None
+        key = (json.dumps(flt, sort_keys=True), self._count, len(self._deleted))
+        entry = self._filter_rows.get(key)
+        if entry is None:
+            if len(self._filter_rows) >= FILTER_CACHE_SIZE:
+                self._filter_rows.clear()
+            deleted, metadata = self._deleted, self._metadata
+            mask = np.fromiter(
+                (r not in deleted and matches_filter(metadata[r], flt) for r in range(self._count)),
+                dtype=bool, count=self._count,
+            )
+            entry = (np.flatnonzero(mask), mask)
+            self._filter_rows[key] = entry
+        return entry
+
+    def _accepted_rows(self, flt: Optional[Dict]) -> Optional[np.ndarray]:
+        """Filas vivas que cumplen el filtro (None = todas)."""
+        entry = self._accepted(flt)
+        return None if entry is None else entry[0]
+
+    def _top_rows(self, scores: np.ndarray, top_k: int, flt: Optional[Dict]) -> List[Tuple[float, int]]:
+        """Las `top_k` filas vivas (y que cumplen el filtro) con mayor puntuación."""
+        rows = self._accepted_rows(flt)
+        if rows is not None:
+            if rows.size == 0:
+                return []
+            scores = scores[rows]
+        else:
+            rows = np.arange(self._count)
+
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(rows[i])) for i in top]
+
+    def _hnsw_search(self, q: np.ndarray, top_k: int, flt: Optional[Dict], ef: int) -> List[Tuple[float, int]]:
+        ep = self._entry
+        ep_score = float(self._data[ep] @ q)
+        for layer in range(self._max_level, 0, -1):
+            ep, ep_score = self._greedy_closest(q, ep, ep_score, layer)
+        entry = self._accepted(flt)
+        found = self._search_layer(q, [(ep_score, ep)], max(ef, top_k), 0, None if entry is None else entry[1])
+        return found[:top_k]
+
+    def _greedy_closest(self, q: np.ndarray, ep: int, ep_score: float, layer: int) -> Tuple[int, float]:
+        changed = True
+        while changed:
+            changed = False
+            neigh = self._neighbors[ep][layer]
+            if not neigh:
+                break
+            scores = self._data[neigh] @ q
+            best = int(np.argmax(scores))
+            if scores[best] > ep_score:
+                ep, ep_score = neigh[best], float(scores[best])
+                changed = True
+        return ep, ep_score
+
+    def _search_layer(
+        self,
+        q: np.ndarray,
+        entry_points: List[Tuple[float, int]],
+        ef: int,
+        layer: int,
+        accept: Optional[np.ndarray] = None,
+    ) -> List[Tuple[float, int]]:
+        """
+        Búsqueda en haz sobre una capa; devuelve (score, fila) ordenado de mayor a menor.
+        `accept` es la máscara de filas que pueden entrar en el resultado (None = todas).
+        """
+        visited = {row for _, row in entry_points}
+        candidates = [(-score, row) for score, row in entry_points]
+        heapq.heapify(candidates)
+        results: List[Tuple[float, int]] = []
+        for score, row in entry_points:
+            if accept is None or accept[row]:
+                heapq.heappush(results, (score, row))
+
+        while candidates:
+            neg_score, row = heapq.heappop(candidates)
+            if len(results) >= ef and -neg_score < results[0][0]:
+                break
+            neigh = [n for n in self._neighbors[row][layer] if n not in visited]
+            if not neigh:
+                continue
+            visited.update(neigh)
+            scores = self._data[neigh] @ q
+            ok = [True] * len(neigh) if accept is None else accept[neigh].tolist()
+            for n, s, a in zip(neigh, scores.tolist(), ok):
+                if len(results) < ef or s > results[0][0]:
+                    heapq.heappush(candidates, (-s, n))
+                    if a:
+                        heapq.heappush(results, (s, n))
+                        if len(results) > ef:
+                            heapq.heappop(results)
+
+        return sorted(results, reverse=True)
+
+    # ------------------------------------------------------------------
+    # Construcción del grafo
+    # ------------------------------------------------------------------
+    def _ensure_capacity(self, extra: int):
+        needed = self._count + extra
+        if isinstance(self._data, np.memmap) or needed > self._data.shape[0]:
+            capacity = max(needed, 2 * self._data.shape[0], 64)
+            data = np.zeros((capacity, self.dimension), dtype=np.float32)
+            data[: self._count] = self._data[: self._count]
+            self._data = data
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._ml)
+
+    def _insert(self, row: int):
+        level = self._random_level()
+        self._levels.append(level)
+        self._neighbors.append([[] for _ in range(level + 1)])
+
+        if self._entry is None:
+            self._entry, self._max_level = row, level
+            return
+
+        q = self._data[row]
+        ep = self._entry
+        ep_score = float(self._data[ep] @ q)
+        for layer in range(self._max_level, level, -1):
+            ep, ep_score = self._greedy_closest(q, ep, ep_score, layer)
+
+        entry_points = [(ep_score, ep)]
+        for layer in range(min(level, self._max_level), -1, -1):
+            candidates = self._search_layer(q, entry_points, self.ef_construction, layer)
+            neighbors = self._select_neighbors(candidates, self.m)
+            self._neighbors[row][layer] = neighbors
+
+            max_conn = self.m0 if layer == 0 else self.m
+            for n in neighbors:
+                links = self._neighbors[n][layer]
+                links.append(row)
+                if len(links) > max_conn:
+                    scores = self._data[links] @ self._data[n]
+                    ranked = sorted(zip(scores.tolist(), links), reverse=True)
+                    self._neighbors[n][layer] = self._select_neighbors(ranked, max_conn)
+            entry_points = candidates
+
+        if level > self._max_level:
+            self._entry, self._max_level = row, level
+
+    def _select_neighbors(self, candidates: List[Tuple[float, int]], m: int) -> List[int]:
+        """
+        Heurística de HNSW: prioriza vecinos que estén más cerca del nodo que de
+        los ya elegidos, y completa con los descartados hasta llegar a m.
+        """
+        rows = [row for _, row in candidates]
+        if len(rows) <= m:
+            return rows
+
+        sims = self._data[rows] @ self._data[rows].T
+        selected: List[int] = []
+        pruned: List[int] = []
+        for i, (score, _) in enumerate(candidates):
+            if len(selected) >= m:
+                break
+            if all(sims[i, j] < score for j in selected):
+                selected.append(i)
+            else:
+                pruned.append(i)
+        for i in pruned:
+            if len(selected) >= m:
+                break
+            selected.append(i)
+        return [rows[i] for i in selected]
+
+    @staticmethod
+    def _parse_vector(v) -> Tuple[str, List[float], Optional[Dict]]:
+        if isinstance(v, dict):
+            return v["id"], v["values"], v.get("metadata")
+        if len(v) == 2:
+            return v[0], v[1], None
+        return v[0], v[1], v[2]
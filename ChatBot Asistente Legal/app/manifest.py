@@ -0,0 +1,91 @@
+"""
+Manifiesto local (SQLite) de lo que ya está en el índice vectorial: hash de
+cada PDF y hash de contenido de cada chunk, para re-indexar sólo lo que cambió.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    source TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    chunk_id TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+"""
+
+
+def chunk_hash(text: str, metadata: Dict, salt: str = "") -> str:
+    """Hash del texto + metadata del chunk (salt = modelo de embeddings)."""
+    h = hashlib.sha256()
+    h.update(salt.encode("utf-8"))
+    h.update(b"\0")
+    h.update(text.encode("utf-8"))
+    h.update(b"\0")
+    h.update(json.dumps(metadata, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+
+class IndexManifest:
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def sources(self) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT source FROM files UNION SELECT DISTINCT source FROM chunks"
+        ).fetchall()
+        return [r[0] for r in rows]
+
+    def file_hash(self, source: str) -> Optional[str]:
+        row = self.conn.execute("SELECT file_hash FROM files WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else None
+
+    def set_file_hash(self, source: str, file_hash: str):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (source, file_hash, indexed_at) VALUES (?, ?, ?)",
+                (source, file_hash, time.time()),
+            )
+
+    def file_hashes(self) -> Dict[str, str]:
+        return dict(self.conn.execute("SELECT source, file_hash FROM files").fetchall())
+
+    def all_chunks(self) -> List[Tuple[str, str, str]]:
+        """(chunk_id, source, content_hash) de todas las leyes."""
+        return self.conn.execute("SELECT chunk_id, source, content_hash FROM chunks ORDER BY chunk_id").fetchall()
+
+    def chunk_hashes(self, source: str) -> Dict[str, str]:
+        rows = self.conn.execute(
+            "SELECT chunk_id, content_hash FROM chunks WHERE source = ?", (source,)
+        ).fetchall()
+        return dict(rows)
+
+    def update_chunks(self, source: str, upserted: Dict[str, str], deleted: List[str]):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, source, content_hash) VALUES (?, ?, ?)",
+                [(chunk_id, source, h) for chunk_id, h in upserted.items()],
+            )
+            self.conn.executemany("DELETE FROM chunks WHERE chunk_id = ?", [(c,) for c in deleted])
+
+    def forget_source(self, source: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            self.conn.execute("DELETE FROM files WHERE source = ?", (source,))
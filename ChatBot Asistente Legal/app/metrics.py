@@ -0,0 +1,141 @@
+"""
+Métricas en memoria para /metrics en formato de texto de Prometheus: histogramas
+de latencia por etapa y gauges que se leen en el momento de la consulta
+(cachés, colas, tiempo de carga de modelos). Sin dependencias externas.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# Segundos: de 1 ms (lookup, caché) a 10 s (rerank bajo carga)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Labels, List] = {}  # labels -> [cuentas por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * len(self.buckets), 0.0, 0]
+            if i < len(self.buckets):
+                series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total_sum, count in snapshot:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total_sum)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """
+    Valor leído al renderizar: `fn` devuelve un número, o un dict
+    {valores de etiquetas: número} si el gauge tiene etiquetas.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, fn: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (), kind: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind  # "counter" para totales que sólo crecen (aciertos de caché)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        series = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, v in series:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(v)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(line for m in self._metrics for line in m.render()) + "\n"
+
+
+REGISTRY = Registry()
+
+# 🔹 Etapas de LegalSearcher.search (lookup, encode, query, rerank) y de /ask (compose, total)
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "legal_stage_seconds", "Duración de cada etapa de la búsqueda y de la respuesta.", ["stage"],
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "legal_request_seconds", "Duración de /ask dentro de la API, según cómo se resolvió.", ["path"],
+))
+BATCH_SIZE = REGISTRY.register(Histogram(
+    "legal_batch_size", "Preguntas por lote del micro-batcher.", buckets=(1, 2, 4, 8, 16, 32, 64),
+))
+
+_model_load_seconds: Dict[Labels, float] = {}
+REGISTRY.register(Gauge(
+    "legal_model_load_seconds", "Tiempo de carga de cada modelo/índice al arrancar.",
+    lambda: dict(_model_load_seconds), ["model"],
+))
+
+
+def observe_stages(timings: Dict[str, float]):
+    """Vuelca en el histograma los segundos por etapa medidos con app.query.stage."""
+    for name, seconds in timings.items():
+        STAGE_SECONDS.observe(seconds, name)
+
+
+def record_load_time(model: str, seconds: float):
+    _model_load_seconds[(model,)] = seconds
+
+
+def timed_load(model: str, fn: Callable, *args, **kwargs):
+    """Llama a `fn` (carga de un modelo o índice) y registra cuánto tardó."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    record_load_time(model, time.perf_counter() - start)
+    return result
@@ -0,0 +1,110 @@
+"""
+Códigos compactos de los embeddings para el índice local: PCA opcional (aprendida
+con los propios vectores al indexar) seguida de cuantización escalar int8 o de
+códigos binarios (signo). Se usan para un escaneo rápido y barato en RAM; los
+mejores candidatos se vuelven a puntuar con los vectores float32 originales.
+"""
+from typing import Dict, Optional
+
+import numpy as np
+
+KINDS = ("float32", "int8", "binary")
+PCA_SAMPLE = 20000  # filas usadas para aprender la PCA y las escalas int8
+SCAN_BLOCK = 65536  # filas por bloque al puntuar (acota la memoria temporal)
+
+# Bits a 1 de cada byte, para la distancia de Hamming (NumPy >= 2 trae np.bitwise_count)
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.int32)
+
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits).sum(axis=1, dtype=np.int32)
+    return _POPCOUNT[bits].sum(axis=1, dtype=np.int32)
+
+
+class VectorCodec:
+    def __init__(self, kind: str, mean: np.ndarray, components: Optional[np.ndarray], scale: Optional[np.ndarray]):
+        if kind not in KINDS:
+            raise ValueError(f"Cuantización desconocida: {kind}")
+        self.kind = kind
+        self.mean = mean
+        self.components = components  # (pca_dim, dim) o None
+        self.scale = scale  # escala por dimensión (int8) o None
+
+    @property
+    def pca_dim(self) -> int:
+        return 0 if self.components is None else self.components.shape[0]
+
+    @classmethod
+    def fit(cls, data: np.ndarray, kind: str, pca_dim: int = 0, seed: int = 0) -> "VectorCodec":
+        """Aprende media, componentes PCA y escalas a partir de (una muestra de) los vectores."""
+        if data.shape[0] > PCA_SAMPLE:
+            rows = np.sort(np.random.default_rng(seed).choice(data.shape[0], PCA_SAMPLE, replace=False))
+            data = data[rows]
+        data = np.asarray(data, dtype=np.float32)
+        mean = data.mean(axis=0)
+        components = None
+        if pca_dim and pca_dim < data.shape[1]:
+            _, _, vt = np.linalg.svd(data - mean, full_matrices=False)
+            components = np.ascontiguousarray(vt[:pca_dim], dtype=np.float32)
+
+        codec = cls(kind, mean, components, None)
+        if kind == "int8":
+            projected = codec.project(data)
+            codec.scale = np.maximum(np.abs(projected).max(axis=0), 1e-6).astype(np.float32) / 127
+        return codec
+
+    def project(self, data: np.ndarray) -> np.ndarray:
+        """Vectores del índice centrados (y proyectados si hay PCA)."""
+        centered = np.asarray(data, dtype=np.float32) - self.mean
+        return centered if self.components is None else centered @ self.components.T
+
+    def project_query(self, q: np.ndarray) -> np.ndarray:
+        # q·x = q·media + q·(x - media): el primer término es igual para todas las filas
+        return q if self.components is None else self.components @ q
+
+    def encode(self, data: np.ndarray) -> np.ndarray:
+        projected = self.project(data)
+        if self.kind == "int8":
+            return np.clip(np.rint(projected / self.scale), -127, 127).astype(np.int8)
+        if self.kind == "binary":
+            return np.packbits(projected > 0, axis=1)
+        return projected.astype(np.float32)
+
+    def scores(self, codes: np.ndarray, q: np.ndarray) -> np.ndarray:
+        """Puntuación aproximada de cada fila: mayor = más parecida (sólo sirve para ordenar)."""
+        qp = self.project_query(q).astype(np.float32)
+        if self.kind == "binary":
+            qbits = np.packbits(qp > 0)
+            out = np.empty(codes.shape[0], dtype=np.float32)
+            for start in range(0, codes.shape[0], SCAN_BLOCK):
+                block = codes[start:start + SCAN_BLOCK]
+                out[start:start + len(block)] = -_popcount(np.bitwise_xor(block, qbits))
+            return out
+        if self.kind == "int8":
+            qp = qp * self.scale
+            out = np.empty(codes.shape[0], dtype=np.float32)
+            for start in range(0, codes.shape[0], SCAN_BLOCK):
+                block = codes[start:start + SCAN_BLOCK]
+                out[start:start + len(block)] = block.astype(np.float32) @ qp
+            return out
+        return codes @ qp
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            "kind": np.array(self.kind),
+            "mean": self.mean,
+            "components": self.components if self.components is not None else np.zeros((0, 0), np.float32),
+            "scale": self.scale if self.scale is not None else np.zeros(0, np.float32),
+        }
+
+    @classmethod
+    def from_state(cls, state) -> "VectorCodec":
+        components = state["components"]
+        scale = state["scale"]
+        return cls(
+            str(state["kind"]),
+            state["mean"],
+            components if components.size else None,
+            scale if scale.size else None,
+        )
@@ -1,40 +1,271 @@
-from typing import Dict, List
-from sentence_transformers import SentenceTransformer, CrossEncoder
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from app.article_lookup import find_article_reference
+from app.cache import LRUCache, normalize_question
+from app.index import (
+    index_root, init_index, load_article_lookup, load_bm25, read_index_generation, source_key,
+)
+from app.runtime import build_cross_encoder
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "2048"))
+# Candidatos que pasan al cross-encoder (0 = max(top_k * 5, 20), el valor histórico)
+RERANK_DEPTH = int(os.getenv("RERANK_DEPTH", "0"))
+RRF_K = 60
+# Consultas simultáneas a Pinecone al resolver un lote (el índice local usa query_many)
+QUERY_CONCURRENCY = int(os.getenv("QUERY_CONCURRENCY", "8"))
+WARMUP_QUERY = "¿Cuántas horas es la jornada laboral máxima?"
+RERANKER_MODEL = "cross-encoder/ms-marco-MiniLM-L6-v2"
+
+def build_reranker() -> "CrossEncoder":
+    return build_cross_encoder(RERANKER_MODEL)
+
+@contextmanager
+def stage(timings: Optional[Dict[str, float]], name: str):
+    """Acumula en `timings[name]` los segundos que tarda el bloque (no hace nada si es None)."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+def reciprocal_rank_fusion(rankings: List[List[Dict]], k: int = RRF_K) -> List[Dict]:
+    """Fusiona listas de candidatos por id: score = suma de 1 / (k + posición)."""
+    fused: Dict[str, Dict] = {}
+    for ranking in rankings:
+        for rank, c in enumerate(ranking):
+            entry = fused.setdefault(c["id"], dict(c, rrf_score=0.0))
+            entry["rrf_score"] += 1.0 / (k + rank + 1)
+    return sorted(fused.values(), key=lambda c: c["rrf_score"], reverse=True)
+
+def _candidate(vector_id: str, score: float, meta: Dict) -> Dict:
+    return {
+        "id": vector_id,
+        "score": score,
+        "article_number": meta.get("article_number"),
+        "title": meta.get("title"),
+        "text": meta.get("text"),
+        "source": meta.get("source"),
+    }
 
 class LegalSearcher:
-    def __init__(self, index, model: SentenceTransformer):
+    def __init__(
+        self, index, model: "SentenceTransformer", bm25=None, articles=None, rerank_depth: int = RERANK_DEPTH,
+        reranker: Optional["CrossEncoder"] = None, generation: Optional[Tuple[str, int]] = None,
+    ):
         self.index = index
         self.model = model
-        self.reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L6-v2")
-
-    def search(self, user_query: str, top_k: int = 5) -> List[Dict]:
-        qvec = self.model.encode(user_query).tolist()
-        res = self.index.query(
-            vector=qvec,
-            top_k=max(top_k * 5, 20),
-            include_metadata=True
+        self.bm25 = bm25  # app.bm25.BM25Index opcional: activa la búsqueda híbrida
+        self.articles = articles  # app.article_lookup.ArticleLookup opcional: "artículo N" directo
+        self.rerank_depth = rerank_depth
+        self.reranker = reranker if reranker is not None else build_reranker()
+        # Pregunta normalizada -> embedding (no depende del índice, sólo del modelo)
+        self.embed_cache = LRUCache(EMBED_CACHE_SIZE)
+        # (versión, mtime del alias VERSION) con los que se cargaron índice, BM25 y artículos
+        self.generation = read_index_generation() if generation is None else generation
+        self.version = self.generation[0]
+
+    def with_generation(self, generation: Tuple[str, int]) -> "LegalSearcher":
+        """
+        Un buscador sobre otra versión del índice (o la misma, actualizada en el
+        sitio) con su índice, BM25 y tabla de artículos, que comparte modelos y
+        caché de embeddings con este. Se reemplaza entero, así que una consulta
+        nunca mezcla dos versiones.
+        """
+        version = generation[0]
+        root = index_root(version)
+        searcher = LegalSearcher(
+            init_index(version), self.model, bm25=load_bm25(root),
+            articles=load_article_lookup(root), rerank_depth=self.rerank_depth, reranker=self.reranker,
+            generation=generation,
         )
+        searcher.embed_cache = self.embed_cache
+        return searcher
+
+    def warm_up(self):
+        """
+        Una inferencia de cada modelo y una consulta al índice, sin tocar las
+        cachés: la primera pregunta real no paga la inicialización perezosa.
+        """
+        qvec = self.model.encode([WARMUP_QUERY])[0].tolist()
+        self.index.query(vector=qvec, top_k=1)
+        self.reranker.predict([(WARMUP_QUERY, WARMUP_QUERY)])
+
+    def encode_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeddings de varias preguntas; las que no están en caché van en un solo encode."""
+        keys = [normalize_question(q) for q in queries]
+        vectors = [self.embed_cache.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            encoded = self.model.encode([queries[i] for i in missing])
+            for i, vec in zip(missing, encoded):
+                vectors[i] = vec.tolist()
+                self.embed_cache.put(keys[i], vectors[i])
+        return vectors
+
+    def encode_query(self, user_query: str) -> List[float]:
+        return self.encode_queries([user_query])[0]
+
+    def retrieve(
+        self, qvec: List[float], top_k: int, source: Optional[str] = None, user_query: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Candidatos para el reranker; el filtro por ley se aplica en el índice. Con
+        BM25 cargado, fusiona la lista densa y la léxica por reciprocal-rank fusion.
+        """
+        return self.retrieve_many([qvec], [top_k], [source], [user_query])[0]
+
+    def retrieve_many(
+        self, qvecs: List[List[float]], top_ks: List[int], sources: List[Optional[str]],
+        user_queries: List[Optional[str]],
+    ) -> List[List[Dict]]:
+        """
+        retrieve() de varias preguntas, agrupadas por ley: cada grupo comparte
+        filtro y va al índice de una vez (query_many en el índice local); con
+        Pinecone las consultas se lanzan en paralelo.
+        """
+        groups: Dict[Optional[str], List[int]] = defaultdict(list)
+        for i, source in enumerate(sources):
+            groups[source_key(source) if source else None].append(i)
+
+        responses: List = [None] * len(qvecs)
+        jobs = []
+        for key, members in groups.items():
+            depth = max(max(top_ks[i] * 5, 20) for i in members)
+            query_filter = {"source_key": {"$eq": key}} if key else None
+            if hasattr(self.index, "query_many"):
+                found = self.index.query_many(
+                    [qvecs[i] for i in members], top_k=depth, include_metadata=True, filter=query_filter
+                )
+                for i, res in zip(members, found):
+                    responses[i] = res
+            else:
+                jobs.extend((i, depth, query_filter) for i in members)
+
+        def run(job):
+            i, depth, query_filter = job
+            return self.index.query(vector=qvecs[i], top_k=depth, include_metadata=True, filter=query_filter)
+
+        if len(jobs) > 1:
+            # Pinecone: cada consulta es un viaje por red, se lanzan a la vez
+            with ThreadPoolExecutor(min(QUERY_CONCURRENCY, len(jobs))) as executor:
+                found = list(executor.map(run, jobs))
+        else:
+            found = [run(job) for job in jobs]
+        for (i, _, _), res in zip(jobs, found):
+            responses[i] = res
+
+        return [
+            self._fuse(res, top_ks[i], sources[i], user_queries[i]) for i, res in enumerate(responses)
+        ]
+
+    def _fuse(self, res, top_k: int, source: Optional[str], user_query: Optional[str]) -> List[Dict]:
+        depth = max(top_k * 5, 20)
+        candidates = [_candidate(m.id, m.score, m.metadata or {}) for m in res.matches[:depth]]
+
+        if self.bm25 is not None and user_query:
+            lexical = [
+                _candidate(vector_id, None, meta)
+                for _, vector_id, meta in self.bm25.search(user_query, depth, source_key(source) if source else None)
+            ]
+            candidates = reciprocal_rank_fusion([candidates, lexical])
+
+        return candidates[: self.rerank_depth or depth]
+
+    def rerank_many(self, queries: List[str], candidate_lists: List[List[Dict]], top_ks: List[int]) -> List[List[Dict]]:
+        """Reordena los candidatos de varias preguntas con una sola llamada al cross-encoder."""
+        pairs = [(q, c.get("text", "")) for q, cands in zip(queries, candidate_lists) for c in cands]
+        re_scores = self.reranker.predict(pairs) if pairs else []
+
+        results = []
+        offset = 0
+        for cands, top_k in zip(candidate_lists, top_ks):
+            for c, s in zip(cands, re_scores[offset:offset + len(cands)]):
+                c["re_rank_score"] = float(s)
+            offset += len(cands)
+            cands.sort(key=lambda x: x["re_rank_score"], reverse=True)
+            results.append(cands[:top_k])
+        return results
+
+    def lookup_article(self, user_query: str, top_k: int, source: Optional[str]) -> Optional[List[Dict]]:
+        """
+        Si la pregunta cita un artículo concreto de la ley elegida y existe en la
+        tabla, devuelve sus chunks tal cual (exacto, sin embeddings ni reranker).
+        """
+        if self.articles is None or not source:
+            return None
+        number = find_article_reference(user_query)
+        if number is None:
+            return None
+        entries = self.articles.get(source_key(source), number)
+        if not entries:
+            return None
+        return [dict(_candidate(e["id"], 1.0, e), direct_match=True) for e in entries[:top_k]]
+
+    def search_many(
+        self, requests: List[Tuple[str, int, Optional[str]]], timings: Optional[Dict[str, float]] = None
+    ) -> List[List[Dict]]:
+        """
+        Atiende varias (pregunta, top_k, ley) a la vez: un encode para todas las
+        preguntas y un predict del cross-encoder para todos los pares. Las que
+        citan un artículo existente se responden desde la tabla de artículos.
+        Si se pasa `timings`, acumula ahí los segundos de cada etapa
+        ("lookup", "encode", "query", "rerank").
+        """
+        with stage(timings, "lookup"):
+            results: List[Optional[List[Dict]]] = [self.lookup_article(q, k, s) for q, k, s in requests]
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending:
+            return results
+
+        queries = [requests[i][0] for i in pending]
+        top_ks = [requests[i][1] for i in pending]
+        with stage(timings, "encode"):
+            qvecs = self.encode_queries(queries)
+        with stage(timings, "query"):
+            candidate_lists = self.retrieve_many(
+                qvecs, top_ks, [requests[i][2] for i in pending], queries
+            )
+        with stage(timings, "rerank"):
+            reranked = self.rerank_many(queries, candidate_lists, top_ks)
+        for i, found in zip(pending, reranked):
+            results[i] = found
+        return results
+
+    def candidates(
+        self, user_query: str, top_k: int, source: Optional[str] = None, timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict]:
+        """Primera mitad de search(): encode y consulta al índice, sin reranker."""
+        with stage(timings, "encode"):
+            qvec = self.encode_query(user_query)
+        with stage(timings, "query"):
+            return self.retrieve(qvec, top_k, source, user_query)
+
+    def rerank(
+        self, user_query: str, candidates: List[Dict], top_k: int, timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict]:
+        """Segunda mitad de search(): reordena los candidatos con el cross-encoder."""
+        with stage(timings, "rerank"):
+            return self.rerank_many([user_query], [candidates], [top_k])[0]
 
-        candidates = []
-        for m in res.matches:
-            meta = m.metadata or {}
-            candidates.append({
-                "id": m.id,
-                "score": m.score,
-                "article_number": meta.get("article_number"),
-                "title": meta.get("title"),
-                "text": meta.get("text"),
-                "source": meta.get("source"),
-            })
-
-        pairs = [(user_query, c.get("text", "")) for c in candidates]
-        re_scores = self.reranker.predict(pairs)
-
-        for c, s in zip(candidates, re_scores):
-            c["re_rank_score"] = float(s)
-
-        candidates.sort(key=lambda x: x["re_rank_score"], reverse=True)
-        return candidates[:top_k]
+    def search(
+        self, user_query: str, top_k: int = 5, source: Optional[str] = None, timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict]:
+        """
+        Busca en el índice y reordena con el cross-encoder. Si se indica `source`,
+        el filtro por ley se aplica en el propio índice, así que todos los
+        candidatos (y el trabajo del reranker) son de esa ley.
+        """
+        return self.search_many([(user_query, top_k, source)], timings)[0]
 
 def compose_answer(results: List[Dict], user_query: str) -> str:
     if not results:
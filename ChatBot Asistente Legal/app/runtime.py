@@ -0,0 +1,151 @@
+"""
+Runtime de inferencia del bi-encoder y del cross-encoder en CPU:
+
+- ``torch``: PyTorch, como siempre.
+- ``onnx``: el mismo modelo exportado a ONNX (onnxruntime).
+- ``onnx-int8``: ONNX con cuantización dinámica int8 de los pesos.
+
+export_models.py exporta ambos modelos a ONNX_DIR y compara sus salidas con
+PyTorch sobre un conjunto fijo de preguntas (parity.json). Si la comparación
+no pasó, o no hay exportación, se vuelve a PyTorch con un aviso. onnxruntime y
+optimum sólo se necesitan con los runtimes ONNX (``pip install
+"sentence-transformers[onnx]"``).
+
+sentence_transformers (y con él PyTorch) se importa al construir el primer
+modelo, no al importar este módulo: así la API puede abrir el puerto antes.
+"""
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sentence_transformers import CrossEncoder, SentenceTransformer
+
+MODEL_RUNTIME = os.getenv("MODEL_RUNTIME", "torch").lower()
+ONNX_DIR = os.getenv("ONNX_DIR", "models")
+# Conjunto de instrucciones para la cuantización: "avx2", "avx512", "avx512_vnni" o "arm64"
+ONNX_QUANTIZATION = os.getenv("ONNX_QUANTIZATION", "avx2")
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+
+# 🔹 Umbrales de paridad frente a PyTorch
+PARITY_MIN_COSINE = 0.98  # coseno mínimo entre embeddings
+PARITY_MAX_SCORE_DELTA = 0.5  # diferencia máxima de score del cross-encoder (logits)
+PARITY_FILE = "parity.json"
+
+PARITY_QUERIES = [
+    "¿Cuántas horas es la jornada laboral máxima?",
+    "¿Qué indemnización corresponde por despido intempestivo?",
+    "¿Cuántos días de vacaciones tiene un trabajador?",
+    "¿Cuál es la pena por robo?",
+    "¿Qué es una contravención de tránsito?",
+    "¿Cuáles son los principios de la educación intercultural?",
+]
+PARITY_PASSAGES = [
+    "Artículo 47: De la jornada máxima\nLa jornada máxima de trabajo será de ocho horas diarias, de manera que no exceda de cuarenta horas semanales.",
+    "Artículo 188: Indemnización por despido intempestivo\nEl empleador que despidiere intempestivamente al trabajador será condenado a indemnizarlo.",
+    "Artículo 69: Vacaciones anuales\nTodo trabajador tendrá derecho a gozar anualmente de un período ininterrumpido de quince días de descanso.",
+    "Artículo 189: Robo\nLa persona que mediante amenazas o violencias sustraiga o se apodere de cosa mueble ajena será sancionada con pena privativa de libertad.",
+    "Artículo 383: Contravenciones de tránsito\nSon contravenciones de tránsito las infracciones leves a las normas de circulación.",
+    "Artículo 2: Principios\nLa actividad educativa se desarrolla atendiendo a los principios de universalidad, interculturalidad y plurinacionalidad.",
+]
+
+
+def _model_dir(name: str) -> str:
+    return os.path.join(ONNX_DIR, name.replace("/", "__"))
+
+
+def _onnx_file(runtime: str) -> str:
+    return "onnx/model.onnx" if runtime == "onnx" else f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+
+def parity_passed(name: str, runtime: str) -> bool:
+    try:
+        with open(os.path.join(_model_dir(name), PARITY_FILE), encoding="utf-8") as f:
+            return json.load(f).get(runtime, {}).get("passed", False)
+    except FileNotFoundError:
+        return False
+
+
+def _resolve(name: str, runtime: str) -> str:
+    if runtime not in RUNTIMES:
+        raise ValueError(f"MODEL_RUNTIME desconocido: {runtime}")
+    if runtime != "torch" and not parity_passed(name, runtime):
+        print(f"⚠️ {name}: no hay exportación {runtime} que haya pasado la paridad; se usa PyTorch.")
+        return "torch"
+    return runtime
+
+
+def build_embedder(name: str, runtime: str = MODEL_RUNTIME) -> "SentenceTransformer":
+    from sentence_transformers import SentenceTransformer
+
+    runtime = _resolve(name, runtime)
+    if runtime == "torch":
+        return SentenceTransformer(name)
+    return SentenceTransformer(_model_dir(name), backend="onnx", model_kwargs={"file_name": _onnx_file(runtime)})
+
+
+def build_cross_encoder(name: str, runtime: str = MODEL_RUNTIME) -> "CrossEncoder":
+    from sentence_transformers import CrossEncoder
+
+    runtime = _resolve(name, runtime)
+    if runtime == "torch":
+        return CrossEncoder(name)
+    return CrossEncoder(_model_dir(name), backend="onnx", model_kwargs={"file_name": _onnx_file(runtime)})
+
+
+def embedder_parity(reference: "SentenceTransformer", candidate: "SentenceTransformer") -> Dict:
+    texts = PARITY_QUERIES + PARITY_PASSAGES
+    a = reference.encode(texts, normalize_embeddings=True)
+    b = candidate.encode(texts, normalize_embeddings=True)
+    cosines = np.sum(a * b, axis=1)
+    return {
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "passed": bool(cosines.min() >= PARITY_MIN_COSINE),
+    }
+
+
+def cross_encoder_parity(reference: "CrossEncoder", candidate: "CrossEncoder") -> Dict:
+    pairs = [(q, p) for q in PARITY_QUERIES for p in PARITY_PASSAGES]
+    a = np.asarray(reference.predict(pairs)).reshape(len(PARITY_QUERIES), -1)
+    b = np.asarray(candidate.predict(pairs)).reshape(len(PARITY_QUERIES), -1)
+    delta = np.abs(a - b)
+    # Lo que importa al reranker es el orden: el mejor pasaje de cada pregunta debe coincidir
+    top1 = float(np.mean(a.argmax(axis=1) == b.argmax(axis=1)))
+    return {
+        "max_score_delta": float(delta.max()),
+        "mean_score_delta": float(delta.mean()),
+        "top1_agreement": top1,
+        "passed": bool(delta.max() <= PARITY_MAX_SCORE_DELTA and top1 == 1.0),
+    }
+
+
+def export_onnx(name: str, kind: str) -> Dict[str, Dict]:
+    """
+    Exporta `name` (kind = "embedder" o "cross-encoder") a ONNX y a ONNX int8 en
+    ONNX_DIR, comprueba la paridad de ambos con PyTorch y la guarda en parity.json.
+    """
+    from sentence_transformers import CrossEncoder, SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    load = SentenceTransformer if kind == "embedder" else CrossEncoder
+    parity = embedder_parity if kind == "embedder" else cross_encoder_parity
+    directory = _model_dir(name)
+
+    onnx_model = load(name, backend="onnx")
+    onnx_model.save_pretrained(directory)
+    export_dynamic_quantized_onnx_model(onnx_model, ONNX_QUANTIZATION, directory)
+
+    reference = load(name)
+    report = {}
+    for runtime in RUNTIMES[1:]:
+        candidate = load(directory, backend="onnx", model_kwargs={"file_name": _onnx_file(runtime)})
+        report[runtime] = parity(reference, candidate)
+    with open(os.path.join(directory, PARITY_FILE), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def runtimes_available(name: str) -> List[str]:
+    return ["torch"] + [r for r in RUNTIMES[1:] if parity_passed(name, r)]
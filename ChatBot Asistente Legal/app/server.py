@@ -0,0 +1,221 @@
+"""
+Arranque de la API con varios workers que comparten los modelos: el proceso
+padre carga índice y modelos una sola vez (MODEL_LOADING=preload), abre el
+socket y hace fork de los workers. Las páginas de memoria de los pesos quedan
+compartidas (copy-on-write) en lugar de duplicarse en cada worker.
+
+Cada worker crea su pool de inferencia y su micro-batcher, reabre la conexión
+a Pinecone y hace la inferencia de calentamiento después del fork (los hilos
+de PyTorch/OpenMP no sobreviven a un fork).
+
+El padre se queda como supervisor: cada worker escucha además en un puerto de
+salud propio (HEALTH_PORT_BASE + n) donde el padre consulta /ready. Un worker
+que muere, o que deja de responder, se vuelve a lanzar con backoff exponencial
+(desde el mismo padre, así que sigue compartiendo los modelos). Con SIGTERM o
+SIGINT se detienen todos los workers, esperando a que terminen sus peticiones.
+
+Uso (desde la carpeta del proyecto):
+    python -m app.server --port 8001 --workers 2
+"""
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+import urllib.error
+import urllib.request
+
+import uvicorn
+
+HEALTH_INTERVAL = float(os.getenv("HEALTH_INTERVAL", "2"))  # segundos entre comprobaciones de /ready
+HEALTH_TIMEOUT = float(os.getenv("HEALTH_TIMEOUT", "2"))
+HEALTH_FAILURES = int(os.getenv("HEALTH_FAILURES", "3"))  # fallos seguidos antes de reiniciar un worker listo
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "300"))  # plazo para que un worker nuevo quede listo
+RESTART_BACKOFF = float(os.getenv("RESTART_BACKOFF", "1"))  # primer reintento; se duplica si vuelve a caer
+RESTART_BACKOFF_MAX = float(os.getenv("RESTART_BACKOFF_MAX", "60"))
+STABLE_SECONDS = 60  # un worker que vivió esto reinicia el backoff
+SHUTDOWN_TIMEOUT = float(os.getenv("SHUTDOWN_TIMEOUT", "30"))
+
+
+def preload():
+    """Importa la API cargando índice y modelos en este proceso, sin calentarlos."""
+    os.environ["MODEL_LOADING"] = "preload"
+    from app import api
+    return api
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sockets):
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    server.run(sockets=sockets)
+
+
+def probe_ready(port: int) -> bool:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/ready", timeout=HEALTH_TIMEOUT) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+class Worker:
+    def __init__(self, slot: int, health_sock: socket.socket):
+        self.slot = slot
+        self.health_sock = health_sock
+        self.health_port = health_sock.getsockname()[1]
+        self.pid = None
+        self.started_at = 0.0
+        self.ready = False
+        self.unhealthy = 0  # comprobaciones fallidas seguidas
+        self.crashes = 0  # caídas seguidas (para el backoff)
+        self.restart_at = None
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, health_socks):
+        self.app = app
+        self.sock = sock
+        self.workers = [Worker(slot, hs) for slot, hs in enumerate(health_socks)]
+        self.stopping = False
+
+    def spawn(self, worker: Worker):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(self.app, [self.sock, worker.health_sock])
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        worker.pid = pid
+        worker.started_at = time.monotonic()
+        worker.ready = False
+        worker.unhealthy = 0
+        worker.restart_at = None
+        print(f"🔹 Worker {worker.slot} iniciado (pid {pid}, salud en :{worker.health_port}).")
+
+    def reap(self):
+        """Recoge los workers que terminaron y programa su reinicio con backoff."""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            worker = next((w for w in self.workers if w.pid == pid), None)
+            if worker is None:
+                continue
+            worker.pid = None
+            if self.stopping:
+                continue
+            now = time.monotonic()
+            if now - worker.started_at >= STABLE_SECONDS:
+                worker.crashes = 0
+            delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF * 2 ** worker.crashes)
+            worker.crashes += 1
+            worker.restart_at = now + delay
+            print(
+                f"⚠️ Worker {worker.slot} (pid {pid}) terminó con código {os.waitstatus_to_exitcode(status)}; "
+                f"se reinicia en {delay:.0f}s."
+            )
+
+    def check_health(self):
+        for worker in self.workers:
+            if worker.pid is None:
+                if worker.restart_at is not None and time.monotonic() >= worker.restart_at:
+                    self.spawn(worker)
+                continue
+            ok = probe_ready(worker.health_port)
+            now = time.monotonic()
+            if ok:
+                if not worker.ready:
+                    print(f"✅ Worker {worker.slot} (pid {worker.pid}) listo en {now - worker.started_at:.1f}s.")
+                worker.ready = True
+                worker.unhealthy = 0
+                continue
+            # Mientras arranca se le da READY_TIMEOUT; después, HEALTH_FAILURES comprobaciones
+            if worker.ready or now - worker.started_at > READY_TIMEOUT:
+                worker.unhealthy += 1
+                if worker.unhealthy >= HEALTH_FAILURES:
+                    print(f"⚠️ Worker {worker.slot} (pid {worker.pid}) no responde a /ready; se reinicia.")
+                    self._signal(worker, signal.SIGKILL)
+                    worker.unhealthy = 0
+
+    def run(self):
+        for worker in self.workers:
+            self.spawn(worker)
+        signal.signal(signal.SIGINT, self._request_stop)
+        signal.signal(signal.SIGTERM, self._request_stop)
+        while not self.stopping:
+            self.reap()
+            self.check_health()
+            time.sleep(HEALTH_INTERVAL)
+        self.shutdown()
+
+    def shutdown(self):
+        """SIGTERM a todos (uvicorn termina las peticiones en curso) y SIGKILL a los que no salgan a tiempo."""
+        print("🛑 Deteniendo workers...")
+        for worker in self.workers:
+            self._signal(worker, signal.SIGTERM)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while any(w.pid is not None for w in self.workers) and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for worker in self.workers:
+            self._signal(worker, signal.SIGKILL)
+        self.reap()
+
+    def _request_stop(self, signum, frame):
+        self.stopping = True
+
+    @staticmethod
+    def _signal(worker: Worker, signum: int):
+        if worker.pid is None:
+            return
+        try:
+            os.kill(worker.pid, signum)
+        except ProcessLookupError:
+            pass
+
+
+def serve(host: str, port: int, workers: int, health_port_base: int):
+    api = preload()
+    sock = bind_socket(host, port)
+    health_socks = [bind_socket("127.0.0.1", health_port_base + slot) for slot in range(workers)]
+    # Lo cargado hasta aquí no lo vuelve a tocar el recolector: evita que el GC
+    # escriba en esas páginas y rompa el copy-on-write en los workers
+    gc.freeze()
+    print(f"🚀 API en http://{host}:{port} con {workers} workers")
+    try:
+        Supervisor(api.app, sock, health_socks).run()
+    finally:
+        for s in [sock, *health_socks]:
+            s.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", "2")))
+    parser.add_argument("--health-port-base", type=int, default=int(os.getenv("HEALTH_PORT_BASE", "0")),
+                        help="puerto de salud del primer worker (0 = puerto de la API + 100)")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.health_port_base or args.port + 100)
+
+
+if __name__ == "__main__":
+    main()
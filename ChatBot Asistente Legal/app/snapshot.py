@@ -0,0 +1,273 @@
+"""
+Snapshot portable del índice: todos los vectores (float16), ids y metadata
+(por columnas) en un único ``.npz`` comprimido, con checksums SHA-256 de cada
+arreglo. Se importa en el índice local o en Pinecone sin volver a pasar por el
+modelo de embeddings. Los archivos de BM25 y de la tabla de artículos viajan
+en el snapshot (si faltan se reconstruyen a partir de la metadata, que incluye
+el texto de cada chunk) y el manifiesto queda al día para que run_index.py no
+re-embeba nada.
+
+Si el origen es el índice local, el snapshot incluye también su grafo HNSW y al
+importarlo en un índice local vacío se carga tal cual, sin reconstruirlo.
+copy_vectors usa la misma lectura para sembrar una versión nueva del índice
+(re-indexación blue/green) con el contenido de la activa.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app import article_lookup, bm25
+from app.index import (
+    EMBEDDING_MODEL, articles_dir, bm25_dir, delete_vectors, index_root, read_index_version, upsert_vectors,
+)
+
+SNAPSHOT_FORMAT = 1
+FETCH_BATCH_SIZE = 100  # ids por fetch al exportar desde Pinecone
+
+
+class SnapshotError(Exception):
+    """Snapshot corrupto o incompatible con el modelo de embeddings actual."""
+
+
+def _sha256(array: np.ndarray) -> str:
+    return hashlib.sha256(np.ascontiguousarray(array).tobytes()).hexdigest()
+
+
+def _pinecone_records(index) -> Iterator[Tuple[str, List[float], Dict]]:
+    for page in index.list():
+        ids = list(page)
+        for start in range(0, len(ids), FETCH_BATCH_SIZE):
+            res = index.fetch(ids=ids[start:start + FETCH_BATCH_SIZE])
+            for vector_id, vector in res.vectors.items():
+                yield vector_id, vector.values, vector.metadata or {}
+
+
+def _read_index(index) -> Tuple[List[str], np.ndarray, List[Dict], Optional[Dict]]:
+    if hasattr(index, "export"):
+        return (*index.export(), index.export_graph())
+    records = sorted(_pinecone_records(index), key=lambda r: r[0])
+    vectors = np.array([values for _, values, _ in records], dtype=np.float32)
+    return [r[0] for r in records], vectors, [r[2] for r in records], None
+
+
+SIDECAR_PREFIXES = ("bm25", "articles")
+
+
+def _sidecar_dirs(root: str) -> Dict[str, str]:
+    return dict(zip(SIDECAR_PREFIXES, (bm25_dir(root), articles_dir(root))))
+
+
+def _check_sidecar_name(name: str):
+    """"<prefijo>/<archivo>" de un snapshot: prefijo conocido y un nombre de archivo simple, sin rutas."""
+    prefix, _, filename = name.partition("/")
+    if (
+        prefix not in SIDECAR_PREFIXES
+        or not filename
+        or os.path.basename(filename) != filename
+        or "\\" in filename
+        or filename == "."
+        or ".." in filename
+    ):
+        raise SnapshotError(f"Nombre de archivo no válido en el snapshot: '{name}'.")
+
+
+def _read_sidecars(root: str) -> Dict[str, np.ndarray]:
+    """Archivos de BM25 y de la tabla de artículos, como bytes ("bm25/<archivo>": uint8)."""
+    files = {}
+    for prefix, directory in _sidecar_dirs(root).items():
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".tmp"):
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                files[f"{prefix}/{name}"] = np.frombuffer(f.read(), dtype=np.uint8)
+    return files
+
+
+def _write_sidecars(files: Dict[str, np.ndarray], root: str):
+    dirs = _sidecar_dirs(root)
+    for name, content in files.items():
+        prefix, filename = name.split("/", 1)
+        directory = dirs[prefix]
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, filename)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(content.tobytes())
+        os.replace(f"{path}.tmp", path)
+
+
+def _columns(metadata: List[Dict]) -> Tuple[Dict[str, np.ndarray], Dict[str, str]]:
+    """
+    Metadata por columnas: una columna de texto por clave si todos los chunks
+    la tienen como str; si no, JSON por fila ("" = la clave no estaba).
+    """
+    keys: Dict[str, None] = {}
+    for meta in metadata:
+        keys.update(dict.fromkeys(meta))
+
+    columns, kinds = {}, {}
+    for key in keys:
+        values = [meta.get(key) for meta in metadata]
+        if all(isinstance(v, str) for v in values):
+            kinds[key] = "str"
+            columns[key] = np.array(values, dtype=str)
+        else:
+            kinds[key] = "json"
+            columns[key] = np.array(
+                ["" if key not in meta else json.dumps(meta[key], ensure_ascii=False) for meta in metadata], dtype=str
+            )
+    return columns, kinds
+
+
+def copy_vectors(source, target) -> int:
+    """Copia todos los vectores de un índice a otro (p. ej. entre namespaces de Pinecone)."""
+    ids, vectors, metadata, graph = _read_index(source)
+    if graph is not None and hasattr(target, "load_exported") and len(target) == 0:
+        target.load_exported(ids, vectors, metadata, graph)
+        return len(ids)
+    return upsert_vectors(target, ((i, v.tolist(), m) for i, v, m in zip(ids, vectors, metadata)))
+
+
+def export_snapshot(index, path: str, manifest=None, root: Optional[str] = None) -> Dict:
+    """
+    Escribe el snapshot de `index` en `path` (.npz); devuelve sus datos básicos.
+    BM25 y tabla de artículos se leen de `root` (por defecto, la versión activa).
+    """
+    start = time.perf_counter()
+    ids, vectors, metadata, graph = _read_index(index)
+    ids_array = np.array(ids, dtype=str)
+    vectors16 = vectors.astype(np.float16)
+    columns, kinds = _columns(metadata)
+    extra = {f"meta:{key}": column for key, column in columns.items()}
+    if graph is not None:
+        extra["graph"] = np.array(json.dumps(graph))
+    extra.update(_read_sidecars(root or index_root()))
+
+    info = {
+        "format": SNAPSHOT_FORMAT,
+        "embedding_model": EMBEDDING_MODEL,
+        "dimension": int(vectors.shape[1]) if vectors.size else 0,
+        "count": len(ids),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "index_version": read_index_version(),
+        "columns": kinds,
+        "checksums": {
+            "ids": _sha256(ids_array),
+            "vectors": _sha256(vectors16),
+            **{name: _sha256(array) for name, array in extra.items()},
+        },
+        # Manifiesto de re-indexación: así run_index.py no re-embebe tras importar
+        "files": manifest.file_hashes() if manifest is not None else {},
+        "chunks": [list(row) for row in manifest.all_chunks()] if manifest is not None else [],
+    }
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(
+            f,
+            info=np.array(json.dumps(info, ensure_ascii=False)),
+            ids=ids_array,
+            vectors=vectors16,
+            **extra,
+        )
+    os.replace(tmp, path)
+    return {"vectors": len(ids), "bytes": os.path.getsize(path), "seconds": time.perf_counter() - start}
+
+
+def read_snapshot(path: str) -> Tuple[Dict, List[str], np.ndarray, List[Dict], Optional[Dict], Dict[str, np.ndarray]]:
+    """
+    (info, ids, vectores float16, metadata, grafo HNSW o None, archivos de BM25 y
+    tabla de artículos) de un snapshot, tras verificar sus checksums.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        info = json.loads(str(data["info"]))
+        if info.get("format") != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Formato de snapshot desconocido: {info.get('format')}")
+        arrays = {"ids": data["ids"], "vectors": data["vectors"]}
+        arrays.update({f"meta:{key}": data[f"meta:{key}"] for key in info["columns"]})
+        arrays.update({name: data[name] for name in data.files if name == "graph" or "/" in name})
+
+    for name, array in arrays.items():
+        if _sha256(array) != info["checksums"].get(name):
+            raise SnapshotError(f"Checksum incorrecto en '{name}': el snapshot {path} está dañado.")
+
+    ids = arrays["ids"].tolist()
+    metadata: List[Dict] = [{} for _ in ids]
+    for key, kind in info["columns"].items():
+        for meta, value in zip(metadata, arrays[f"meta:{key}"].tolist()):
+            if kind == "str":
+                meta[key] = value
+            elif value != "":
+                meta[key] = json.loads(value)
+    graph = json.loads(str(arrays["graph"])) if "graph" in arrays else None
+    sidecars = {name: array for name, array in arrays.items() if "/" in name}
+    # Antes de escribir nada: un nombre con ".." o con otra ruta saldría de las carpetas de BM25/artículos
+    for name in sidecars:
+        _check_sidecar_name(name)
+    return info, ids, arrays["vectors"], metadata, graph, sidecars
+
+
+def import_snapshot(index, path: str, manifest=None, root: Optional[str] = None) -> Dict:
+    """
+    Carga un snapshot en `index` (local o Pinecone) en lotes, reconstruye BM25 y
+    la tabla de artículos de cada ley (en `root`, por defecto la versión activa)
+    y, con manifiesto, borra los vectores de esas leyes que ya no están en el
+    snapshot y registra los hashes importados.
+    """
+    start = time.perf_counter()
+    root = root or index_root()
+    info, ids, vectors, metadata, graph, sidecars = read_snapshot(path)
+    if info["embedding_model"] != EMBEDDING_MODEL:
+        raise SnapshotError(
+            f"El snapshot se creó con '{info['embedding_model']}' y el índice usa '{EMBEDDING_MODEL}'."
+        )
+
+    if graph is not None and hasattr(index, "load_exported") and len(index) == 0:
+        index.load_exported(ids, vectors.astype(np.float32), metadata, graph)
+        total = len(ids)
+    else:
+        records = (
+            (vector_id, vec.astype(np.float32).tolist(), meta) for vector_id, vec, meta in zip(ids, vectors, metadata)
+        )
+        total = upsert_vectors(index, records)
+
+    # 🔹 BM25 y tabla de artículos: los del snapshot o, si no venían, (id, texto, metadata) por ley
+    _write_sidecars(sidecars, root)
+    by_source: Dict[str, List[Tuple[str, str, Dict]]] = defaultdict(list)
+    for vector_id, meta in zip(ids, metadata):
+        by_source[meta.get("source_key", "")].append((vector_id, meta.get("text", ""), meta))
+    for key, chunks in by_source.items():
+        if not bm25.has_source(bm25_dir(root), key):
+            bm25.write_source(bm25_dir(root), key, chunks)
+        if not article_lookup.has_source(articles_dir(root), key):
+            article_lookup.write_source(articles_dir(root), key, chunks)
+
+    deleted = 0
+    if manifest is not None:
+        chunks_by_source: Dict[str, Dict[str, str]] = defaultdict(dict)
+        for chunk_id, source, content_hash in info["chunks"]:
+            chunks_by_source[source][chunk_id] = content_hash
+        for source in set(chunks_by_source) | set(info["files"]):
+            imported = chunks_by_source.get(source, {})
+            stale = sorted(set(manifest.chunk_hashes(source)) - set(imported))
+            delete_vectors(index, stale)
+            deleted += len(stale)
+            manifest.update_chunks(source, imported, stale)
+        for source, file_hash in info["files"].items():
+            manifest.set_file_hash(source, file_hash)
+
+    return {
+        "vectors": total,
+        "deleted": deleted,
+        "sources": sorted(by_source),
+        "seconds": time.perf_counter() - start,
+    }
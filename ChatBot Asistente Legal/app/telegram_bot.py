@@ -1,5 +1,10 @@
+import asyncio
 import os
-import requests
+import random
+import re
+import time
+from collections import defaultdict
+import httpx
 from dotenv import load_dotenv
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
@@ -9,15 +14,152 @@ from telegram.ext import (
 
 load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+API_URL = os.getenv("API_URL", "http://127.0.0.1:8001")
+# 🔹 "http": pregunta a la API (despliegue separado); "inprocess": carga LegalSearcher en este
+# proceso y busca en un pool de hilos, sin el salto HTTP ni una segunda copia de los modelos
+BOT_SEARCH_MODE = os.getenv("BOT_SEARCH_MODE", "http").lower()
+# Pool de inferencia del modo inprocess (mismas variables que la API)
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_QUEUE = int(os.getenv("INFERENCE_QUEUE", "32"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+
+# 🔹 Cliente HTTP hacia la API: timeouts, reintentos y límites de concurrencia
+BOT_CONNECT_TIMEOUT = float(os.getenv("BOT_CONNECT_TIMEOUT", "5"))
+BOT_READ_TIMEOUT = float(os.getenv("BOT_READ_TIMEOUT", "40"))
+BOT_RETRIES = int(os.getenv("BOT_RETRIES", "2"))  # reintentos ante fallo de conexión o 502/503/504
+BOT_RETRY_BACKOFF = float(os.getenv("BOT_RETRY_BACKOFF", "0.5"))  # segundos; se duplica en cada reintento
+BOT_MAX_CONNECTIONS = int(os.getenv("BOT_MAX_CONNECTIONS", "20"))
+BOT_MAX_CONCURRENCY = int(os.getenv("BOT_MAX_CONCURRENCY", "16"))  # preguntas en curso en todo el bot
+BOT_MAX_PER_USER = int(os.getenv("BOT_MAX_PER_USER", "1"))  # preguntas en curso por usuario
+RETRY_STATUS = {502, 503, 504}
 
 # 🔹 Diccionario de leyes y endpoints
 LAWS = {
-    "Código del Trabajo": "http://127.0.0.1:8001/ask/Código del Trabajo",
-    "Ley Organica de Educacion Intercultural LOEI": "http://127.0.0.1:8001/ask/Ley Organica de Educacion Intercultural LOEI",
-    "Ley Orgánica de Transporte": "http://127.0.0.1:8001/ask/Ley Orgánica de Transporte",
-    "Código Orgánico Integral Penal": "http://127.0.0.1:8001/ask/Código Orgánico Integral Penal"
+    "Código del Trabajo": f"{API_URL}/ask/Código del Trabajo",
+    "Ley Organica de Educacion Intercultural LOEI": f"{API_URL}/ask/Ley Organica de Educacion Intercultural LOEI",
+    "Ley Orgánica de Transporte": f"{API_URL}/ask/Ley Orgánica de Transporte",
+    "Código Orgánico Integral Penal": f"{API_URL}/ask/Código Orgánico Integral Penal"
 }
 
+http_client = None
+searcher = None
+search_pool = None
+searcher_reload = asyncio.Lock()
+failed_generation = None
+api_slots = asyncio.Semaphore(BOT_MAX_CONCURRENCY)
+user_in_flight = defaultdict(int)
+
+# 🔹 Tiempo total de la API según su cabecera Server-Timing ("...total;dur=12.3")
+def server_time_ms(header: str):
+    m = re.search(r"\btotal;dur=([\d.]+)", header or "")
+    return float(m.group(1)) if m else None
+
+# 🔹 Un único cliente con keep-alive para todas las preguntas (se crea con el bot y se cierra con él)
+def get_http_client() -> httpx.AsyncClient:
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(BOT_READ_TIMEOUT, connect=BOT_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=BOT_MAX_CONNECTIONS, max_keepalive_connections=BOT_MAX_CONNECTIONS),
+        )
+    return http_client
+
+async def close_http_client(application=None):
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+# 🔹 POST a la API con reintentos (backoff exponencial con jitter) si no conecta o está saturada
+async def post_question(api_url: str, payload: dict) -> httpx.Response:
+    client = get_http_client()
+    for attempt in range(BOT_RETRIES + 1):
+        try:
+            response = await client.post(api_url, json=payload)
+            if response.status_code not in RETRY_STATUS or attempt == BOT_RETRIES:
+                return response
+        except (httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError):
+            if attempt == BOT_RETRIES:
+                raise
+        await asyncio.sleep(BOT_RETRY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+
+# 🔹 Modo inprocess: índice y modelos en este proceso (fuera del event loop) y pool de inferencia
+async def load_searcher(application=None):
+    global searcher, search_pool
+    if BOT_SEARCH_MODE != "inprocess":
+        return
+    from app.index import (
+        build_embeddings_model, index_root, init_index, load_article_lookup, load_bm25, read_index_generation,
+    )
+    from app.query import LegalSearcher, build_reranker
+    from app.workers import InferencePool
+
+    def load():
+        generation = read_index_generation()
+        root = index_root(generation[0])
+        loaded = LegalSearcher(
+            init_index(generation[0]), build_embeddings_model(),
+            bm25=load_bm25(root), articles=load_article_lookup(root),
+            reranker=build_reranker(), generation=generation,
+        )
+        loaded.warm_up()
+        return loaded
+
+    start = time.perf_counter()
+    searcher = await asyncio.to_thread(load)
+    search_pool = InferencePool(INFERENCE_WORKERS, INFERENCE_QUEUE, INFERENCE_TIMEOUT)
+    print(f"✅ Búsqueda en el proceso del bot lista en {time.perf_counter() - start:.1f}s.")
+
+async def shutdown(application=None):
+    await close_http_client()
+    if search_pool is not None:
+        search_pool.shutdown()
+
+# 🔹 Si run_index.py publicó otra versión del índice (alias VERSION) o actualizó la activa, pasar a ella
+async def refresh_searcher():
+    global searcher, failed_generation
+    from app.index import read_index_generation
+
+    generation = read_index_generation()
+    if generation in (searcher.generation, failed_generation):
+        return
+    async with searcher_reload:
+        if generation != searcher.generation:
+            try:
+                searcher = await asyncio.to_thread(searcher.with_generation, generation)
+                print(f"🔄 Índice en la versión {generation[0]}.")
+            except Exception as e:
+                failed_generation = generation
+                print(f"⚠️ No se pudo cargar la versión {generation[0]} del índice: {e}")
+
+# 🔹 Respuesta buscando directamente con LegalSearcher (sin HTTP)
+async def answer_inprocess(selected_law: str, payload: dict) -> str:
+    from app.query import compose_answer
+    from app.workers import PoolSaturated
+
+    await refresh_searcher()
+    question, top_k = payload["question"], payload["top_k"]
+    try:
+        results = searcher.lookup_article(question, top_k, selected_law)
+        if results is None:
+            results = await search_pool.run(searcher.search, question, top_k, selected_law)
+        return compose_answer(results, question)
+    except PoolSaturated:
+        return "⚠️ El servidor está ocupado, intenta de nuevo en unos segundos."
+    except asyncio.TimeoutError:
+        return "⚠️ La consulta tardó demasiado, intenta de nuevo."
+
+# 🔹 Respuesta preguntando a la API por HTTP
+async def answer_http(selected_law: str, payload: dict) -> str:
+    start = time.perf_counter()
+    response = await post_question(LAWS[selected_law], payload)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    server_ms = server_time_ms(response.headers.get("Server-Timing"))
+    if server_ms is not None:
+        print(f"⏱️ {selected_law}: {elapsed_ms:.0f} ms ({server_ms:.0f} ms en la API, {elapsed_ms - server_ms:.0f} ms de HTTP)")
+    data = response.json()
+    return data.get("answer", "No se encontró información relevante.")
+
 # 🔹 Mensaje de bienvenida con botón "Empezar"
 async def bienvenida(update: Update, context: ContextTypes.DEFAULT_TYPE):
     welcome_text = (
@@ -57,21 +199,42 @@ async def button(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_question = update.message.text
     selected_law = context.user_data.get("selected_law", "Código del Trabajo")
-    api_url = LAWS[selected_law]
+
+    user_id = update.effective_user.id if update.effective_user else update.message.chat_id
+    if user_in_flight[user_id] >= BOT_MAX_PER_USER:
+        await update.message.reply_text("⏳ Todavía estoy respondiendo tu pregunta anterior, espera un momento.")
+        return
 
     payload = {"question": user_question, "top_k": 3}
+    user_in_flight[user_id] += 1
     try:
-        response = requests.post(api_url, json=payload)
-        data = response.json()
-        answer = data.get("answer", "No se encontró información relevante.")
+        async with api_slots:
+            if BOT_SEARCH_MODE == "inprocess":
+                answer = await answer_inprocess(selected_law, payload)
+            else:
+                answer = await answer_http(selected_law, payload)
+    except httpx.TimeoutException:
+        answer = "⚠️ La consulta tardó demasiado, intenta de nuevo."
     except Exception as e:
         answer = f"⚠️ Error al consultar la API: {e}"
+    finally:
+        user_in_flight[user_id] -= 1
+        if not user_in_flight[user_id]:
+            del user_in_flight[user_id]
 
     await update.message.reply_text(answer)
 
 # 🔹 Lanzamiento del bot
 if __name__ == "__main__":
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    # Las actualizaciones se atienden en paralelo: una respuesta lenta no detiene al resto de usuarios
+    app = (
+        ApplicationBuilder()
+        .token(TELEGRAM_TOKEN)
+        .concurrent_updates(BOT_MAX_CONCURRENCY * 2)
+        .post_init(load_searcher)
+        .post_shutdown(shutdown)
+        .build()
+    )
 
     # ✅ Detecta saludos para iniciar
     app.add_handler(MessageHandler(filters.TEXT & filters.Regex(r'(?i)\b(hola|hol|buenas|hey|iniciar)\b'), bienvenida))
@@ -0,0 +1,130 @@
+"""
+Re-indexación blue/green: run_index.py construye cada índice en una versión
+nueva (VERSIONS_DIR/<versión>, con su índice local o un namespace de Pinecone
+del mismo nombre, su BM25, su tabla de artículos y su manifiesto) sin tocar la
+que está atendiendo consultas. La versión nueva parte de una copia de la
+activa, así que sólo se embebe lo que cambió.
+
+Cuando la versión nueva pasa la validación, el alias (el archivo VERSION) se
+cambia con un os.replace atómico; la API y el bot cargan la versión nueva al
+ver el cambio. Después se borran las versiones viejas, dejando KEEP_VERSIONS
+anteriores a la activa para poder volver atrás. El índice de antes de
+blue/green (archivos sueltos en LOCAL_INDEX_DIR, namespace por defecto de
+Pinecone) cuenta como la versión más antigua.
+"""
+import os
+import shutil
+from typing import List, Optional, Tuple
+
+from app.index import (
+    INDEX_VERSION_FILE, LOCAL_INDEX_DIR, VECTOR_BACKEND, VERSIONS_DIR, bump_index_version, index_root,
+    init_index, init_pinecone, new_version_id, read_index_version,
+)
+from app.snapshot import copy_vectors
+
+KEEP_VERSIONS = int(os.getenv("KEEP_VERSIONS", "1"))
+# Nombre con el que collect_garbage informa del índice sin versión
+LEGACY = "(índice sin versión)"
+
+
+def list_versions() -> List[str]:
+    """Versiones en disco, de la más antigua a la más reciente (el nombre empieza por la fecha)."""
+    if not os.path.isdir(VERSIONS_DIR):
+        return []
+    return sorted(v for v in os.listdir(VERSIONS_DIR) if os.path.isdir(os.path.join(VERSIONS_DIR, v)))
+
+
+def _root_entries(root: str) -> List[str]:
+    """Archivos de una versión (índice local, BM25, artículos, manifiesto) sin las demás versiones ni el alias."""
+    if not os.path.isdir(root):
+        return []
+    skip = {os.path.basename(VERSIONS_DIR), os.path.basename(INDEX_VERSION_FILE)}
+    return [name for name in os.listdir(root) if name not in skip and not name.endswith(".tmp")]
+
+
+def _copy_root(source: str, target: str):
+    for name in _root_entries(source):
+        path = os.path.join(source, name)
+        if os.path.isdir(path):
+            shutil.copytree(path, os.path.join(target, name))
+        else:
+            shutil.copy2(path, os.path.join(target, name))
+
+
+def create_version(seed: bool = True) -> Tuple[str, object]:
+    """
+    Crea una versión vacía o, con `seed`, una copia de la activa. Devuelve
+    (versión, índice) listos para indexar sin afectar a la versión activa.
+    """
+    version = new_version_id()
+    root = os.path.join(VERSIONS_DIR, version)
+    os.makedirs(root)
+    active = read_index_version()
+    source = index_root(active)
+    if seed and os.path.isdir(source):
+        _copy_root(source, root)
+    index = init_index(version)
+    if seed and VECTOR_BACKEND != "local":
+        copied = copy_vectors(init_index(active), index)
+        print(f"📋 {copied} vectores copiados de la versión activa al namespace '{version}'.")
+    return version, index
+
+
+def activate_version(version: str):
+    """Cambia el alias a `version`: quien lea VERSION a partir de ahora ve la versión completa."""
+    if index_root(version) == LOCAL_INDEX_DIR:
+        raise ValueError(f"La versión {version} no existe en {VERSIONS_DIR}.")
+    bump_index_version(version)
+
+
+def republish_active() -> str:
+    """
+    Vuelve a escribir el alias con la versión activa (o una nueva si no hay
+    ninguna) tras actualizarla en el sitio: cambia su mtime y la API y el bot recargan.
+    """
+    return bump_index_version(read_index_version() or None)
+
+
+def drop_version(version: str):
+    legacy = version == LEGACY
+    namespace = "" if legacy else version
+    if VECTOR_BACKEND == "pinecone":
+        try:
+            init_pinecone().delete(delete_all=True, namespace=namespace)
+        except Exception as e:
+            # Un namespace que nunca recibió vectores no existe en Pinecone
+            print(f"⚠️ No se pudo borrar el namespace '{namespace}' de Pinecone: {e}")
+    if not legacy:
+        shutil.rmtree(os.path.join(VERSIONS_DIR, version), ignore_errors=True)
+        return
+    for name in _root_entries(LOCAL_INDEX_DIR):
+        path = os.path.join(LOCAL_INDEX_DIR, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def _has_default_namespace() -> bool:
+    try:
+        return init_pinecone().describe_index_stats().namespaces.get("", None) is not None
+    except Exception:
+        return False
+
+
+def collect_garbage(keep: int = KEEP_VERSIONS, active: Optional[str] = None) -> List[str]:
+    """
+    Borra las versiones anteriores a la activa salvo las `keep` más recientes.
+    Las posteriores no se tocan: pueden ser una construcción en curso.
+    """
+    active = read_index_version() if active is None else active
+    if index_root(active) == LOCAL_INDEX_DIR:
+        # La activa es el índice sin versión: no hay nada anterior que borrar
+        return []
+    older = [v for v in list_versions() if v < active]
+    if _root_entries(LOCAL_INDEX_DIR) or (VECTOR_BACKEND == "pinecone" and _has_default_namespace()):
+        older.insert(0, LEGACY)
+    dropped = older[:-keep] if keep > 0 else older
+    for version in dropped:
+        drop_version(version)
+    return dropped
@@ -0,0 +1,56 @@
+"""
+Pool acotado de hilos para la inferencia (encoder, índice y cross-encoder), de
+modo que el event loop de FastAPI nunca quede bloqueado por el modelo.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+
+class PoolSaturated(Exception):
+    """La cola de inferencia está llena: el cliente debe reintentar más tarde."""
+
+
+class InferencePool:
+    def __init__(self, workers: int = 2, max_queue: int = 32, timeout: float = 30.0):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # Los hilos comparten los modelos ya cargados; PyTorch libera el GIL al calcular
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Tareas en ejecución + en cola."""
+        return self._in_flight
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self._in_flight - self.workers)
+
+    def submit(self, fn: Callable[..., Any], *args) -> Future:
+        """Encola `fn` si hay cupo (si no, PoolSaturated); sirve también desde hilos fuera del event loop."""
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                raise PoolSaturated()
+            self._in_flight += 1
+
+        future = self._executor.submit(fn, *args)
+        # El cupo se libera cuando la tarea termina de verdad (o se cancela antes de empezar),
+        # no cuando el cliente deja de esperar
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: float = None) -> Any:
+        future = self.submit(fn, *args)
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,73 @@
+"""
+/ask_batch frente a N llamadas secuenciales a /ask/{ley}: mismas preguntas
+(únicas, para no acertar en la caché), mismas respuestas, tiempo total de cada
+forma. Con --stream mide también el tiempo hasta la primera línea NDJSON.
+
+Uso (con la API levantada en el puerto 8001):
+    python -m bench.ask_batch --questions 200
+"""
+import argparse
+import json
+import time
+
+import requests
+
+from bench.load_test import QUESTIONS
+
+LAWS = ["Código del Trabajo", "Código Orgánico Integral Penal"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    run_id = int(time.time())
+    items = [
+        {"law": LAWS[i % len(LAWS)], "question": f"{QUESTIONS[i % len(QUESTIONS)]} ({run_id}-{i})", "top_k": args.top_k}
+        for i in range(args.questions)
+    ]
+    batch_items = [dict(item, question=f"{item['question']} lote") for item in items]
+
+    with requests.Session() as session:
+        start = time.perf_counter()
+        sequential = []
+        for item in items:
+            r = session.post(f"{args.url}/ask/{item['law']}", json={"question": item["question"], "top_k": item["top_k"]})
+            r.raise_for_status()
+            sequential.append(r.json()["answer"])
+        sequential_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        first_line = None
+        if args.stream:
+            batched = [None] * len(batch_items)
+            with session.post(f"{args.url}/ask_batch", json={"items": batch_items, "stream": True}, stream=True) as r:
+                r.raise_for_status()
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    first_line = first_line or time.perf_counter() - start
+                    row = json.loads(line)
+                    batched[row["index"]] = row.get("answer")
+        else:
+            r = session.post(f"{args.url}/ask_batch", json={"items": batch_items})
+            r.raise_for_status()
+            batched = [row["answer"] for row in r.json()["results"]]
+        batch_s = time.perf_counter() - start
+
+    # Las preguntas del lote llevan un sufijo distinto (para no acertar en la caché): se compara la cita
+    same = sum(a.split("Cita:")[-1].split("\n")[0] == b.split("Cita:")[-1].split("\n")[0] for a, b in zip(sequential, batched))
+    print(f"🔹 {args.questions} preguntas, top_k={args.top_k}")
+    print(f"secuencial /ask   {sequential_s:8.2f}s  {args.questions / sequential_s:7.1f} preguntas/s")
+    print(f"/ask_batch        {batch_s:8.2f}s  {args.questions / batch_s:7.1f} preguntas/s  (x{sequential_s / batch_s:.1f})")
+    if first_line is not None:
+        print(f"primera línea NDJSON a los {first_line * 1000:.0f} ms")
+    print(f"misma cita en {same}/{args.questions} respuestas")
+
+
+if __name__ == "__main__":
+    main()
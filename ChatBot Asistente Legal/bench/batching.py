@@ -0,0 +1,76 @@
+"""
+Throughput vs. latencia del micro-batching en CPU: C clientes concurrentes
+lanzan preguntas únicas (sin aciertos de caché) contra LegalSearcher, primero
+sin batching (pool de hilos) y luego con distintas ventanas/tamaños de lote.
+
+Uso (desde la carpeta del proyecto, con el índice configurado):
+    python -m bench.batching --clients 32 --requests 8 --windows 2 5 10 --max-batch 8 16 32
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.batcher import MicroBatcher
+from app.index import build_embeddings_model, init_index
+from app.query import LegalSearcher
+from bench.load_test import QUESTIONS
+
+LAW = "Código del Trabajo"
+
+
+def drive(clients: int, per_client: int, ask):
+    latencies = []
+
+    def client(client_id: int):
+        for i in range(per_client):
+            question = f"{QUESTIONS[(client_id + i) % len(QUESTIONS)]} ({client_id}-{i})"
+            start = time.perf_counter()
+            ask(question)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+    p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+    return len(latencies) / elapsed, p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=8, help="preguntas por cliente")
+    parser.add_argument("--workers", type=int, default=2, help="hilos de inferencia sin batching")
+    parser.add_argument("--windows", type=float, nargs="+", default=[2, 5, 10])
+    parser.add_argument("--max-batch", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    searcher = LegalSearcher(init_index(), build_embeddings_model())
+    searcher.embed_cache.maxsize = 0  # medir siempre el encoder
+    searcher.search("calentamiento", top_k=args.top_k, source=LAW)
+
+    print(f"{'modo':<28}{'req/s':>8}{'p50 ms':>10}{'p99 ms':>10}")
+
+    with ThreadPoolExecutor(max_workers=args.workers) as workers:
+        def ask_direct(question):
+            return workers.submit(searcher.search, question, args.top_k, LAW).result()
+        rps, p50, p99 = drive(args.clients, args.requests, ask_direct)
+    print(f"{f'sin batching ({args.workers} hilos)':<28}{rps:>8.1f}{p50:>10.1f}{p99:>10.1f}")
+
+    for window in args.windows:
+        for max_batch in args.max_batch:
+            batcher = MicroBatcher(searcher.search_many, window, max_batch, max_queue=10 ** 6)
+            rps, p50, p99 = drive(
+                args.clients, args.requests,
+                lambda q: batcher.submit((q, args.top_k, LAW)).result(),
+            )
+            batcher.shutdown()
+            label = f"ventana {window:g}ms, lote {max_batch}"
+            print(f"{label:<28}{rps:>8.1f}{p50:>10.1f}{p99:>10.1f}  (lote medio {batcher.batched_items / max(batcher.batches, 1):.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Concurrencia del bot de Telegram frente a una API lenta, sin Telegram: levanta
+una API de prueba local (responde en ms, salvo las preguntas que piden
+"lenta", "colgada" o "saturada") y llama a handle_message con actualizaciones
+simuladas de varios usuarios a la vez.
+
+Comprueba que:
+- mientras un usuario espera una respuesta lenta, los demás reciben la suya al momento;
+- un usuario con una pregunta en curso recibe un aviso en vez de encolar otra;
+- una respuesta colgada termina en el timeout de lectura del cliente;
+- un 503 pasajero de la API se reintenta con backoff.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.bot_concurrency --users 20
+"""
+import argparse
+import asyncio
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+SLOW_SECONDS = 2.0
+HANG_SECONDS = 6.0
+PORT = 8031
+
+os.environ.setdefault("API_URL", f"http://127.0.0.1:{PORT}")
+os.environ.setdefault("BOT_READ_TIMEOUT", "4")
+os.environ.setdefault("BOT_RETRY_BACKOFF", "0.2")
+
+from app import telegram_bot as bot  # noqa: E402
+
+stub = FastAPI()
+failures = {}
+
+
+@stub.post("/ask/{ley}")
+async def ask(ley: str, body: dict):
+    question = body["question"]
+    if "lenta" in question:
+        await asyncio.sleep(SLOW_SECONDS)
+    elif "colgada" in question:
+        await asyncio.sleep(HANG_SECONDS)
+    elif "saturada" in question and failures.get(question, 0) < 2:
+        failures[question] = failures.get(question, 0) + 1
+        return JSONResponse(status_code=503, content={"answer": "⚠️ El servidor está ocupado"})
+    return {"answer": f"respuesta a: {question}"}
+
+
+def start_stub() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(stub, port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def send(user_id: int, question: str, t0: float):
+    """Simula un mensaje de `user_id` y devuelve (segundos hasta la respuesta, respuesta)."""
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append((time.perf_counter() - t0, text))
+
+    update = SimpleNamespace(
+        message=SimpleNamespace(text=question, chat_id=user_id, reply_text=reply_text),
+        effective_user=SimpleNamespace(id=user_id),
+    )
+    context = SimpleNamespace(user_data={"selected_law": "Código del Trabajo"})
+    await bot.handle_message(update, context)
+    return replies[0]
+
+
+async def scenario(users: int):
+    t0 = time.perf_counter()
+    slow = asyncio.create_task(send(1, "pregunta lenta", t0))
+    await asyncio.sleep(0.1)
+    repeated = asyncio.create_task(send(1, "otra pregunta mientras espero", t0))
+    others = [asyncio.create_task(send(100 + u, f"pregunta rápida {u}", t0)) for u in range(users)]
+    hang = asyncio.create_task(send(2, "pregunta colgada", t0))
+    retried = asyncio.create_task(send(3, "pregunta saturada", t0))
+
+    fast = await asyncio.gather(*others)
+    print(f"🔹 {users} usuarios con preguntas rápidas mientras el usuario 1 espera {SLOW_SECONDS:.0f}s:")
+    print(f"   última respuesta rápida a los {max(t for t, _ in fast) * 1000:.0f} ms")
+    print(f"🔹 usuario 1, segunda pregunta: {(await repeated)[1]!r} a los {(await repeated)[0] * 1000:.0f} ms")
+    t, text = await slow
+    print(f"🔹 usuario 1, pregunta lenta: {text!r} a los {t:.2f}s")
+    t, text = await retried
+    print(f"🔹 usuario 3, API con 503 dos veces: {text!r} a los {t:.2f}s ({failures['pregunta saturada']} reintentos)")
+    t, text = await hang
+    print(f"🔹 usuario 2, API colgada {HANG_SECONDS:.0f}s: {text!r} a los {t:.2f}s (timeout {bot.BOT_READ_TIMEOUT:.0f}s)")
+    await bot.close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    server = start_stub()
+    try:
+        asyncio.run(scenario(args.users))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Latencia de una pregunta del bot según BOT_SEARCH_MODE: "http" (contra la API
+levantada en API_URL) frente a "inprocess" (LegalSearcher en el propio
+proceso). Llama a handle_message con actualizaciones simuladas, sin Telegram,
+con preguntas únicas para no acertar en la caché de la API.
+
+Uso (desde la carpeta del proyecto, con la API levantada para el modo http):
+    python -m bench.bot_modes --questions 100
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from app import telegram_bot as bot
+from bench.load_test import QUESTIONS
+
+
+async def ask(question: str, law: str) -> float:
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        message=SimpleNamespace(text=question, chat_id=1, reply_text=reply_text),
+        effective_user=SimpleNamespace(id=1),
+    )
+    start = time.perf_counter()
+    await bot.handle_message(update, SimpleNamespace(user_data={"selected_law": law}))
+    if replies[0].startswith("⚠️"):
+        raise RuntimeError(replies[0])
+    return time.perf_counter() - start
+
+
+async def run(modes, n: int, law: str):
+    run_id = int(time.time())
+    print(f"{'modo':<12}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode in modes:
+        bot.BOT_SEARCH_MODE = mode
+        await bot.load_searcher()
+        await ask(QUESTIONS[0], law)  # conexión / calentamiento fuera del cronómetro
+        with contextlib.redirect_stdout(io.StringIO()):  # sin el "⏱️" de cada pregunta en modo http
+            latencies = [await ask(f"{QUESTIONS[i % len(QUESTIONS)]} ({mode} {run_id}-{i})", law) for i in range(n)]
+        p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+        print(f"{mode:<12}{p50:>9.1f}{p95:>9.1f}")
+    await bot.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["http", "inprocess"])
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--law", default="Código del Trabajo")
+    args = parser.parse_args()
+    asyncio.run(run(args.modes, args.questions, args.law))
+
+
+if __name__ == "__main__":
+    main()
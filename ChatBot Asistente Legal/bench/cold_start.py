@@ -0,0 +1,97 @@
+"""
+Arranque en frío de la API según MODEL_LOADING: tiempo hasta que el puerto
+responde (GET /), hasta que /ready da 200 y latencia de la primera pregunta.
+Con --workers > 1 arranca app/server.py (preload + fork) e informa la memoria
+PSS de cada proceso (Linux), para ver cuánto comparten los workers.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.cold_start --modes eager background preload --workers 2
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+QUESTION = {"question": "¿Cuántas horas es la jornada laboral máxima?", "top_k": 3}
+
+
+def wait_for(client: httpx.Client, url: str, timeout: float, ok=lambda r: True) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if ok(client.get(url)):
+                return time.perf_counter()
+        except httpx.TransportError:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} no respondió en {timeout:.0f}s")
+
+
+def process_tree(pid: int):
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = [int(c) for c in f.read().split()]
+    except OSError:
+        return [pid]
+    return [pid] + [p for child in children for p in process_tree(child)]
+
+
+def pss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+def cold_start(mode: str, workers: int, port: int, law: str, timeout: float):
+    env = dict(os.environ, MODEL_LOADING=mode)
+    if workers > 1:
+        cmd = [sys.executable, "-m", "app.server", "--port", str(port), "--workers", str(workers)]
+    else:
+        cmd = [sys.executable, "-m", "uvicorn", "app.api:app", "--port", str(port), "--log-level", "warning"]
+    base = f"http://127.0.0.1:{port}"
+
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL)
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            bound = wait_for(client, f"{base}/", timeout) - start
+            ready = wait_for(client, f"{base}/ready", timeout, lambda r: r.status_code == 200) - start
+            ask_start = time.perf_counter()
+            client.post(f"{base}/ask/{law}", json=QUESTION).raise_for_status()
+            first_ask = time.perf_counter() - ask_start
+        pss = [pss_mb(pid) for pid in process_tree(proc.pid)]
+        return bound, ready, first_ask, pss
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["eager", "background", "preload"])
+    parser.add_argument("--workers", type=int, default=2, help="workers de app/server.py en el modo preload")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--law", default="Código del Trabajo")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    print(f"{'modo':<12}{'workers':>8}{'puerto s':>10}{'listo s':>9}{'1ª /ask ms':>12}   PSS MB por proceso")
+    for mode in args.modes:
+        workers = args.workers if mode == "preload" else 1
+        bound, ready, first_ask, pss = cold_start(mode, workers, args.port, args.law, args.timeout)
+        print(
+            f"{mode:<12}{workers:>8}{bound:>10.2f}{ready:>9.2f}{first_ask * 1000:>12.1f}   "
+            f"{' + '.join(f'{p:.0f}' for p in pss)} = {sum(pss):.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Tiempo de extracción de texto de un PDF: serie (1 proceso) vs. pool de procesos.
+Verifica además que ambos caminos producen exactamente el mismo texto.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.extraction "data/Código Organico Integral Penal.pdf" --workers 4
+"""
+import argparse
+import os
+import time
+
+from app.ingest import PDF_WORKERS, extract_text_from_pdf
+
+
+def timed(path: str, workers: int, repeat: int):
+    best, text = float("inf"), ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_text_from_pdf(path, workers=workers)
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", default=os.path.join("data", "Código Organico Integral Penal.pdf"))
+    parser.add_argument("--workers", type=int, default=PDF_WORKERS)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    serial, serial_text = timed(args.pdf, 1, args.repeat)
+    parallel, parallel_text = timed(args.pdf, args.workers, args.repeat)
+    assert serial_text == parallel_text, "la extracción en paralelo no coincide con la serial"
+
+    print(f"📄 {args.pdf} ({len(serial_text):,} caracteres)")
+    print(f"serie:               {serial:.2f}s")
+    print(f"paralelo ({args.workers} procesos): {parallel:.2f}s  (x{serial / parallel:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Filtro por ley en el índice (user-006) frente al post-filtro anterior, con un
+índice y un reranker falsos que cuentan lo que pasa por ellos: no hacen falta
+modelos ni Pinecone.
+
+Antes, /ask/{ley} buscaba en todas las leyes, reordenaba los max(top_k * 5, 20)
+candidatos y después descartaba los de otras leyes. Ahora el filtro por
+source_key va en la consulta al índice. Para cada pregunta se cuentan los
+candidatos del índice (y cuántos son de la ley pedida), los pares que recibe
+el cross-encoder (y cuántos de otras leyes) y los resultados que llegan a la
+respuesta.
+
+Comprueba que:
+- con el filtro, todos los candidatos y todos los resultados son de la ley pedida;
+- los pares de rerank gastados en otras leyes bajan a 0;
+- los pares de rerank por resultado útil bajan.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.filter_pushdown --questions 200
+"""
+import argparse
+import random
+from types import SimpleNamespace
+from typing import Dict, List
+
+import numpy as np
+
+from app.index import source_key
+from app.query import LegalSearcher
+
+DIMENSION = 32
+# Tamaños relativos parecidos a los de data/: el COIP domina el índice
+LAWS = {
+    "Código Organico Integral Penal": 0.55,
+    "Código del Trabajo": 0.25,
+    "LeyOrganica de Educacion Intercultural LOEI": 0.12,
+    "LEY ORGÁNICA DE TRANSPORTE ": 0.08,
+}
+
+
+class CountingIndex:
+    """Índice exacto en memoria con filtro por metadata; cuenta los candidatos devueltos."""
+
+    def __init__(self, chunks: int, seed: int):
+        rng = np.random.default_rng(seed)
+        names = list(LAWS)
+        sources = rng.choice(len(names), size=chunks, p=list(LAWS.values()))
+        self.vectors = rng.standard_normal((chunks, DIMENSION)).astype(np.float32)
+        self.vectors /= np.linalg.norm(self.vectors, axis=1, keepdims=True)
+        self.metadata = [
+            {
+                "article_number": str(i), "title": f"Artículo {i}", "text": f"texto {i}",
+                "source": names[s], "source_key": source_key(names[s]),
+            }
+            for i, s in enumerate(sources)
+        ]
+        self.returned = 0
+
+    def query(self, vector, top_k, include_metadata=True, filter=None):
+        scores = self.vectors @ np.asarray(vector, dtype=np.float32)
+        if filter:
+            wanted = filter["source_key"]["$eq"]
+            mask = np.array([m["source_key"] == wanted for m in self.metadata])
+            scores = np.where(mask, scores, -np.inf)
+        order = [int(i) for i in np.argsort(-scores)[:top_k] if np.isfinite(scores[i])]
+        self.returned += len(order)
+        return SimpleNamespace(
+            matches=[SimpleNamespace(id=f"chunk{i}", score=float(scores[i]), metadata=self.metadata[i]) for i in order]
+        )
+
+
+class CountingReranker:
+    """Cross-encoder falso: puntúa al azar (reproducible) y guarda los pares que recibe."""
+
+    def __init__(self, seed: int):
+        self.rng = random.Random(seed)
+        self.pairs: List = []
+
+    def predict(self, pairs):
+        self.pairs.extend(pairs)
+        return [self.rng.random() for _ in pairs]
+
+
+class RandomEncoder:
+    def __init__(self, seed: int):
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, texts, batch_size=None):
+        return self.rng.standard_normal((len(texts), DIMENSION)).astype(np.float32)
+
+
+def legacy_ask(searcher: LegalSearcher, question: str, top_k: int, ley: str) -> List[Dict]:
+    """Comportamiento anterior: búsqueda sin filtro, rerank de todo y post-filtro por ley."""
+    qvec = searcher.encode_query(question)
+    res = searcher.index.query(vector=qvec, top_k=max(top_k * 5, 20), include_metadata=True)
+    candidates = [
+        {"id": m.id, "score": m.score, "text": m.metadata.get("text"), "source": m.metadata.get("source")}
+        for m in res.matches
+    ]
+    re_scores = searcher.reranker.predict([(question, c["text"]) for c in candidates])
+    for c, s in zip(candidates, re_scores):
+        c["re_rank_score"] = float(s)
+    candidates.sort(key=lambda x: x["re_rank_score"], reverse=True)
+    return [r for r in candidates[:top_k] if source_key(r["source"]) == source_key(ley)]
+
+
+def measure(name: str, ask, index: CountingIndex, reranker: CountingReranker, questions, top_k: int) -> Dict:
+    index.returned, reranker.pairs = 0, []
+    answered = in_law = 0
+    for question, ley in questions:
+        results = ask(question, top_k, ley)
+        answered += len(results)
+        in_law += sum(source_key(r["source"]) == source_key(ley) for r in results)
+    pairs_by_question = {q: ley for q, ley in questions}
+    off_law = sum(
+        1 for q, text in reranker.pairs
+        if index.metadata[int(text.split()[-1])]["source_key"] != source_key(pairs_by_question[q])
+    )
+    row = {
+        "name": name,
+        "candidates": index.returned / len(questions),
+        "pairs": len(reranker.pairs) / len(questions),
+        "off_law_pairs": off_law / len(questions),
+        "results": answered / len(questions),
+        "in_law": in_law,
+        "answered": answered,
+        "pairs_per_result": len(reranker.pairs) / max(answered, 1),
+    }
+    print(
+        f"{name:<14}{row['candidates']:>12.1f}{row['pairs']:>10.1f}{row['off_law_pairs']:>14.1f}"
+        f"{row['results']:>12.2f}{row['pairs_per_result']:>14.1f}"
+    )
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=4000)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = CountingIndex(args.chunks, args.seed)
+    reranker = CountingReranker(args.seed)
+    searcher = LegalSearcher(index, RandomEncoder(args.seed), reranker=reranker)
+    rng = random.Random(args.seed)
+    # Pregunta -> ley elegida, repartidas por igual entre las leyes (como en el bot)
+    questions = [(f"pregunta {i}", rng.choice(list(LAWS))) for i in range(args.questions)]
+
+    print(f"🔹 {args.chunks} chunks en {len(LAWS)} leyes, {args.questions} preguntas, top_k={args.top_k}")
+    print(f"{'':<14}{'candidatos':>12}{'pares':>10}{'pares otras':>14}{'resultados':>12}{'pares/result.':>14}")
+    before = measure("post-filtro", lambda q, k, ley: legacy_ask(searcher, q, k, ley), index, reranker, questions, args.top_k)
+    after = measure("filtro índice", searcher.search, index, reranker, questions, args.top_k)
+
+    assert after["in_law"] == after["answered"], "hay resultados de otra ley con el filtro en el índice"
+    assert after["off_law_pairs"] == 0, "el reranker recibió candidatos de otras leyes"
+    assert before["off_law_pairs"] > 0, "el post-filtro no gastó pares en otras leyes: el caso no es representativo"
+    assert after["pairs_per_result"] < before["pairs_per_result"], "los pares de rerank por resultado no bajaron"
+    assert after["results"] == args.top_k, "con el filtro cada pregunta debe tener top_k resultados"
+    print(
+        f"✅ Pares de rerank en otras leyes: {before['off_law_pairs']:.1f} -> 0 por pregunta; "
+        f"pares por resultado útil: {before['pairs_per_result']:.1f} -> {after['pairs_per_result']:.1f}."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Prueba de carga de la API: N clientes concurrentes enviando preguntas a
+/ask/{ley} mientras otro hilo sondea GET / (health). Reporta throughput y
+latencias p50/p95/p99 de ambos.
+
+Uso (con la API levantada en el puerto 8001):
+    python -m bench.load_test --clients 50 --requests 10
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+QUESTIONS = [
+    "¿Cuántas horas es la jornada laboral máxima?",
+    "¿Qué indemnización corresponde por despido intempestivo?",
+    "¿Cuántos días de vacaciones tiene un trabajador?",
+    "¿Cuándo se paga la décima tercera remuneración?",
+    "¿Cuál es la pena por robo?",
+    "¿Qué es una contravención de tránsito?",
+    "¿Cuál es la pena por conducir en estado de embriaguez?",
+    "¿Cuáles son los principios de la educación intercultural?",
+]
+
+
+def report(name: str, latencies, errors: int, elapsed: float):
+    arr = np.array(latencies) * 1000 if latencies else np.array([0.0])
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    print(
+        f"{name:<8} n={len(latencies):<5} errores={errors:<4} "
+        f"{len(latencies) / elapsed:7.1f} req/s  p50={p50:7.1f}ms  p95={p95:7.1f}ms  p99={p99:7.1f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8001")
+    parser.add_argument("--law", default="Código del Trabajo")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=10, help="preguntas por cliente")
+    parser.add_argument("--unique", action="store_true", help="hace cada pregunta única para no acertar en la caché")
+    args = parser.parse_args()
+
+    ask_lat, health_lat = [], []
+    errors = {"ask": 0, "health": 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def client(client_id: int):
+        with requests.Session() as session:
+            for i in range(args.requests):
+                question = QUESTIONS[(client_id + i) % len(QUESTIONS)]
+                if args.unique:
+                    question = f"{question} (cliente {client_id}, {i})"
+                start = time.perf_counter()
+                try:
+                    r = session.post(f"{args.url}/ask/{args.law}", json={"question": question, "top_k": 3}, timeout=60)
+                    ok = r.status_code == 200
+                except requests.RequestException:
+                    ok = False
+                with lock:
+                    ask_lat.append(time.perf_counter() - start)
+                    errors["ask"] += 0 if ok else 1
+
+    def health():
+        with requests.Session() as session:
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    ok = session.get(f"{args.url}/", timeout=10).status_code == 200
+                except requests.RequestException:
+                    ok = False
+                health_lat.append(time.perf_counter() - start)
+                errors["health"] += 0 if ok else 1
+                time.sleep(0.05)
+
+    prober = threading.Thread(target=health, daemon=True)
+    prober.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as clients:
+        list(clients.map(client, range(args.clients)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    print(f"🔹 {args.clients} clientes x {args.requests} preguntas en {elapsed:.1f}s")
+    report("/ask", ask_lat, errors["ask"], elapsed)
+    report("/", health_lat, errors["health"], elapsed)
+
+
+if __name__ == "__main__":
+    main()
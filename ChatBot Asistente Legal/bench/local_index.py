@@ -0,0 +1,100 @@
+"""
+Benchmark del índice local: latencia p50/p99 y recall@k del grafo HNSW
+frente al escaneo exacto (flat), sobre las cuatro leyes de data/ troceadas y
+embebidas como en run_index.py. El filtro por ley es el de /ask (source_key).
+
+La fila "por defecto" es query() sin forzar nada: con pocas filas candidatas
+(LOCAL_EXACT_ROWS) va directamente al escaneo exacto; las filas "hnsw" fuerzan
+el grafo.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.local_index --queries 200 --top-k 20
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+
+from app.index import build_chunks, build_embeddings_model, encode_batches, source_key
+from app.ingest import load_legal_articles
+from app.local_index import LocalIndex
+
+DATA_DIR = "data"
+
+
+def load_corpus(model):
+    """Trocea y embebe todas las leyes igual que run_index.py (build_chunks + encode_batches)."""
+    chunks, queries = [], []
+    for filename in sorted(os.listdir(DATA_DIR)):
+        if not filename.endswith(".pdf"):
+            continue
+        source = os.path.splitext(filename)[0]
+        articles = load_legal_articles(os.path.join(DATA_DIR, filename))
+        chunks.extend(build_chunks(articles, source, model))
+        queries.extend((a["title"], source) for a in articles if a.get("title"))
+
+    print(f"🔹 Embebiendo {len(chunks)} chunks...")
+    vectors = [(vid, np.asarray(vec, dtype=np.float32), meta) for vid, vec, meta in encode_batches(model, chunks)]
+    return vectors, queries
+
+
+def percentiles_ms(latencies):
+    arr = np.array(latencies) * 1000
+    return np.percentile(arr, 50), np.percentile(arr, 99)
+
+
+def run(index, qvecs, sources, top_k, use_filter, **query_kwargs):
+    latencies, results = [], []
+    for qvec, source in zip(qvecs, sources):
+        flt = {"source_key": {"$eq": source_key(source)}} if use_filter else None
+        start = time.perf_counter()
+        res = index.query(vector=qvec, top_k=top_k, filter=flt, **query_kwargs)
+        latencies.append(time.perf_counter() - start)
+        results.append({m.id for m in res.matches})
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--ef", type=int, nargs="+", default=[16, 32, 64, 128])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    model = build_embeddings_model()
+    vectors, queries = load_corpus(model)
+
+    start = time.perf_counter()
+    index = LocalIndex(dimension=vectors[0][1].shape[0])
+    index.upsert(vectors=vectors)
+    print(f"🔹 Grafo HNSW construido en {time.perf_counter() - start:.1f}s ({len(index)} vectores)")
+
+    random.Random(args.seed).shuffle(queries)
+    queries = queries[: args.queries]
+    qvecs = model.encode([q for q, _ in queries], batch_size=64)
+    sources = [s for _, s in queries]
+
+    print(f"\n{'modo':<22}{'filtro':<8}{'p50 ms':>9}{'p99 ms':>9}{'recall@' + str(args.top_k):>12}")
+    exact_rows = index.exact_rows
+    for use_filter in (False, True):
+        exact_lat, exact_res = run(index, qvecs, sources, args.top_k, use_filter, exact=True)
+        p50, p99 = percentiles_ms(exact_lat)
+        label = "ley" if use_filter else "-"
+        print(f"{'exacto (flat)':<22}{label:<8}{p50:>9.2f}{p99:>9.2f}{1.0:>12.3f}")
+
+        configs = [(f"por defecto ({exact_rows})", exact_rows, {})]
+        configs += [(f"hnsw ef={ef}", 0, {"ef": ef}) for ef in args.ef]
+        for name, rows, kwargs in configs:
+            index.exact_rows = rows
+            lat, res = run(index, qvecs, sources, args.top_k, use_filter, **kwargs)
+            recall = np.mean([len(r & e) / max(len(e), 1) for r, e in zip(res, exact_res)])
+            p50, p99 = percentiles_ms(lat)
+            print(f"{name:<22}{label:<8}{p50:>9.2f}{p99:>9.2f}{recall:>12.3f}")
+        index.exact_rows = exact_rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Variantes del índice local sobre el corpus ya indexado: HNSW float32 frente al
+escaneo de códigos int8 / binarios, con y sin PCA, re-puntuando con los vectores
+completos. Informa recall@k frente a la búsqueda exacta (con y sin filtro por
+ley), latencia p50/p99 y RAM de lo que se escanea.
+
+Uso (desde la carpeta del proyecto, después de run_index.py con VECTOR_BACKEND=local):
+    python -m bench.quantization --top-k 10 --pca 0 128 --rescore 4 10
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.index import build_embeddings_model, index_root, source_key
+from app.local_index import LocalIndex
+from app.evaluation import GOLD_FILE, load_gold
+
+
+def load_queries(index: LocalIndex, gold_file: str, n: int, seed: int):
+    """Preguntas gold + títulos de artículos al azar, cada una con la ley a la que pertenece."""
+    queries = [(item["question"], item["law"]) for item in load_gold(gold_file)]
+    _, _, metadata = index.export()
+    titles = list({(m["title"], m["source"]) for m in metadata if m.get("title")})
+    random.Random(seed).shuffle(titles)
+    return queries + titles[: max(0, n - len(queries))]
+
+
+def run(index: LocalIndex, qvecs, sources, top_k: int, use_filter: bool, **query_kwargs):
+    latencies, results = [], []
+    for qvec, source in zip(qvecs, sources):
+        flt = {"source_key": {"$eq": source_key(source)}} if use_filter else None
+        start = time.perf_counter()
+        res = index.query(vector=qvec, top_k=top_k, filter=flt, **query_kwargs)
+        latencies.append(time.perf_counter() - start)
+        results.append({m.id for m in res.matches})
+    return latencies, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index-dir", default=index_root(), help="por defecto, la versión activa del índice")
+    parser.add_argument("--gold", default=GOLD_FILE)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--pca", type=int, nargs="+", default=[0, 128])
+    parser.add_argument("--rescore", type=int, nargs="+", default=[4, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    index = LocalIndex(args.index_dir)
+    queries = load_queries(index, args.gold, args.queries, args.seed)
+    qvecs = build_embeddings_model().encode([q for q, _ in queries], batch_size=64)
+    sources = [s for _, s in queries]
+    print(f"🔹 {len(index)} vectores de {index.dimension} dimensiones, {len(queries)} consultas, top_k={args.top_k}")
+
+    variants = [("hnsw float32", None, 0, 0)]
+    for pca in args.pca:
+        for kind in ("int8", "binary") if pca == 0 else (None, "int8", "binary"):
+            for rescore in args.rescore:
+                label = f"{kind or 'float32'}{f' pca{pca}' if pca else ''} x{rescore}"
+                variants.append((label, kind, pca, rescore))
+
+    print(f"\n{'variante':<24}{'filtro':<8}{'RAM MB':>9}{'reducción':>10}{'p50 ms':>9}{'p99 ms':>9}{'recall@' + str(args.top_k):>12}")
+    for use_filter in (False, True):
+        _, exact = run(index, qvecs, sources, args.top_k, use_filter, exact=True)
+        label = "ley" if use_filter else "-"
+        for name, kind, pca, rescore in variants:
+            index.configure_quantization(kind, pca, rescore)
+            index.query(vector=qvecs[0], top_k=args.top_k)  # aprende PCA/escala y codifica fuera del cronómetro
+            latencies, found = run(index, qvecs, sources, args.top_k, use_filter)
+
+            usage = index.memory_usage()
+            ram = usage["codes"] or usage["vectors"]
+            recall = np.mean([len(r & e) / max(len(e), 1) for r, e in zip(found, exact)])
+            p50, p99 = np.percentile(np.array(latencies) * 1000, [50, 99])
+            print(
+                f"{name:<24}{label:<8}{ram / 2**20:>9.2f}{usage['vectors'] / ram:>10.1f}"
+                f"{p50:>9.2f}{p99:>9.2f}{recall:>12.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Recall@k, MRR y latencia por etapa de LegalSearcher sobre un archivo gold de
+preguntas con los artículos esperados, contra el índice local (sin red).
+Compara búsqueda densa vs. híbrida (BM25 + RRF), distintas profundidades de
+rerank y, con --exact, HNSW vs. búsqueda exacta.
+
+Etapas medidas: encode, query (ANN + BM25), rerank, compose y total; se
+informa p50/p95/p99 en milisegundos.
+
+Con --min-recall / --min-mrr sale con código 1 si alguna configuración queda
+por debajo, para usarlo como control antes de aceptar un cambio.
+
+Uso (desde la carpeta del proyecto, después de run_index.py con VECTOR_BACKEND=local):
+    python -m bench.retrieval --top-k 3 --depths 5 10 20
+    python -m bench.retrieval --modes híbrido --depths 20 --min-recall 0.8
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+from app.bm25 import BM25Index
+from app.evaluation import GOLD_FILE, STAGES, evaluate, load_gold
+from app.index import build_embeddings_model, index_root, init_local_index
+from app.query import LegalSearcher
+
+MODES = ["denso", "híbrido"]
+
+
+class ExactIndex:
+    """Mismo índice local, pero cada consulta se resuelve por fuerza bruta (referencia de recall)."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, **kwargs):
+        return self.index.query(exact=True, **kwargs)
+
+    def query_many(self, vectors, **kwargs):
+        return self.index.query_many(vectors, exact=True, **kwargs)
+
+
+def run_benchmark(
+    index, model, gold: List[Dict], top_k: int, modes: List[str], depths: List[int], bm25=None, exact: bool = False,
+    reranker=None,
+) -> List[Dict]:
+    """Evalúa cada combinación (índice, modo, profundidad de rerank); devuelve una fila por configuración."""
+    searcher = LegalSearcher(index, model, reranker=reranker)
+    indexes = [("hnsw", index)] + ([("exacto", ExactIndex(index))] if exact else [])
+    rows = []
+    for index_name, idx in indexes:
+        searcher.index = idx
+        for mode in modes:
+            if mode == "híbrido" and bm25 is None:
+                continue
+            searcher.bm25 = bm25 if mode == "híbrido" else None
+            for depth in depths:
+                searcher.rerank_depth = depth
+                metrics = evaluate(searcher, gold, top_k)
+                rows.append(dict(metrics, index=index_name, mode=mode, depth=depth))
+    return rows
+
+
+def print_report(rows: List[Dict], top_k: int):
+    print(f"{'índice':<8}{'modo':<10}{'rerank':>7}{'recall@' + str(top_k):>11}{'MRR':>8}   " + "".join(
+        f"{name + ' p50/p95/p99 ms':>26}" for name in STAGES
+    ))
+    for row in rows:
+        latency = "".join(
+            f"{'{p50:.1f}/{p95:.1f}/{p99:.1f}'.format(**row['latency_ms'][name]):>26}" for name in STAGES
+        )
+        print(f"{row['index']:<8}{row['mode']:<10}{row['depth']:>7}{row['recall']:>11.3f}{row['mrr']:>8.3f}   {latency}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gold", default=GOLD_FILE)
+    parser.add_argument("--index-dir", default=index_root(), help="por defecto, la versión activa del índice")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--depths", type=int, nargs="+", default=[5, 10, 20])
+    parser.add_argument("--exact", action="store_true", help="repite cada configuración con búsqueda exacta")
+    parser.add_argument("--json", help="guarda también los resultados en este archivo")
+    parser.add_argument("--min-recall", type=float)
+    parser.add_argument("--min-mrr", type=float)
+    args = parser.parse_args()
+
+    gold = load_gold(args.gold)
+    index = init_local_index(args.index_dir)
+    if len(index) == 0:
+        sys.exit(f"❌ El índice local en {args.index_dir} está vacío: ejecuta run_index.py con VECTOR_BACKEND=local.")
+    bm25_dir = os.path.join(args.index_dir, "bm25")
+    bm25 = BM25Index.load(bm25_dir)
+    if bm25 is None and "híbrido" in args.modes:
+        print(f"⚠️ No hay índice BM25 en {bm25_dir}: se omite el modo híbrido.")
+
+    print(f"{len(gold)} preguntas gold, top_k={args.top_k}")
+    rows = run_benchmark(index, build_embeddings_model(), gold, args.top_k, args.modes, args.depths, bm25, args.exact)
+    print_report(rows, args.top_k)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+
+    failed = [
+        row for row in rows
+        if (args.min_recall is not None and row["recall"] < args.min_recall)
+        or (args.min_mrr is not None and row["mrr"] < args.min_mrr)
+    ]
+    for row in failed:
+        print(f"❌ {row['index']}/{row['mode']}/rerank {row['depth']}: recall {row['recall']:.3f}, MRR {row['mrr']:.3f}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Latencia del encoder y del cross-encoder en CPU según el runtime (PyTorch, ONNX,
+ONNX int8) con lotes de 1, 8 y 32, y paridad de cada uno frente a PyTorch.
+Sólo se prueban los runtimes ONNX exportados con export_models.py que pasaron
+la paridad.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.runtime --repeat 20
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.index import EMBEDDING_MODEL
+from app.query import RERANKER_MODEL
+from app.runtime import (
+    PARITY_PASSAGES, PARITY_QUERIES, build_cross_encoder, build_embedder, cross_encoder_parity,
+    embedder_parity, runtimes_available,
+)
+
+
+def latency_ms(fn, items, batch_size: int, repeat: int):
+    batch = (items * (batch_size // len(items) + 1))[:batch_size]
+    fn(batch)  # calentamiento
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(batch)
+        samples.append((time.perf_counter() - start) * 1000)
+    return np.percentile(samples, [50, 95])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    texts = PARITY_QUERIES + PARITY_PASSAGES
+    pairs = [(q, p) for q in PARITY_QUERIES for p in PARITY_PASSAGES]
+    models = [
+        ("encoder", EMBEDDING_MODEL, build_embedder, embedder_parity, texts, lambda m, b: m.encode(b, batch_size=len(b))),
+        ("cross-encoder", RERANKER_MODEL, build_cross_encoder, cross_encoder_parity, pairs,
+         lambda m, b: m.predict(b, batch_size=len(b))),
+    ]
+
+    header = "".join(f"{f'lote {b} p50/p95 ms':>22}" for b in args.batches)
+    for label, name, build, parity, items, run in models:
+        print(f"\n🔹 {label}: {name}")
+        print(f"{'runtime':<12}{header}   paridad")
+        reference = None
+        for runtime in runtimes_available(name):
+            model = build(name, runtime)
+            if runtime == "torch":
+                reference = model
+            cells = "".join(
+                f"{'{:.1f}/{:.1f}'.format(*latency_ms(lambda b: run(model, b), items, size, args.repeat)):>22}"
+                for size in args.batches
+            )
+            result = parity(reference, model)
+            details = ", ".join(f"{k}={v:.4f}" for k, v in result.items() if k != "passed")
+            print(f"{runtime:<12}{cells}   {details}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Segmentador de artículos: regex original (lazy + lookahead, con backtracking)
+vs. segmentador en una pasada de app/ingest.py. Verifica que ambos producen
+exactamente los mismos artículos en todos los PDFs y compara tiempos.
+
+Uso (desde la carpeta del proyecto):
+    python -m bench.segmenter
+    python -m bench.segmenter "data/Código del Trabajo.pdf" --repeat 10
+"""
+import argparse
+import glob
+import os
+import re
+import time
+from typing import Dict, List
+
+from app.ingest import load_extraction, split_by_articles
+
+
+def legacy_split_by_articles(text: str) -> List[Dict]:
+    """Implementación anterior, copiada tal cual como referencia."""
+    pattern = r'(?i)(?:\n|^)(artículo|art\.)\s+(\d+)[\.\-–:]?\s*(.*?)(?=\n(?:artículo|art\.)\s+\d+|$)'
+    matches = re.finditer(pattern, text, flags=re.DOTALL)
+
+    articles = []
+    for m in matches:
+        number = m.group(2)
+        maybe_title = m.group(3).strip()
+        parts = maybe_title.split("\n", 1)
+        title = parts[0].strip()
+        body = parts[1].strip() if len(parts) > 1 else ""
+
+        inciso_pattern = r'\n([a-h])\.\s*(.*?)(?=\n[a-h]\.|$)'
+        incisos = re.finditer(inciso_pattern, body, flags=re.DOTALL)
+
+        found = False
+        for inciso in incisos:
+            found = True
+            letra = inciso.group(1)
+            texto = inciso.group(2).strip()
+            articles.append({
+                "id": f"art_{number}_{letra}",
+                "article_number": f"{number}.{letra}",
+                "title": f"{title} — Principio {letra}",
+                "body": texto
+            })
+
+        if not found:
+            articles.append({
+                "id": f"art_{number}",
+                "article_number": number,
+                "title": title,
+                "body": body
+            })
+
+    return articles
+
+
+# Casos límite del regex original que el segmentador nuevo debe reproducir
+EDGE_CASES = [
+    "",
+    "Artículo 1.- Objeto\nTexto",
+    "Preámbulo\nArt. 2: Ámbito\nUno\nARTÍCULO 3 Sin cuerpo",
+    "Artículo 5\nArtículo 6 El espacio tras el número se come el salto de línea",
+    "Artículo 7 Principios\nSon:\na. Uno\nb.\nc. Tres\nh. Ocho\ni. no es inciso",
+    "\nArtículo 8 Empieza con salto\nTexto\n",
+    "Artículo 9 Fin con salto\nTexto\n",
+    "artículo\nArtículo 10 Encabezado roto antes\nart. 11",
+]
+
+
+def timed(fn, text: str, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdfs", nargs="*", default=sorted(glob.glob(os.path.join("data", "*.pdf"))))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for text in EDGE_CASES:
+        assert split_by_articles(text) == legacy_split_by_articles(text), f"difiere en el caso límite {text!r}"
+    print(f"✅ {len(EDGE_CASES)} casos límite idénticos")
+
+    for pdf in args.pdfs:
+        text, _ = load_extraction(pdf)
+        legacy, expected = timed(legacy_split_by_articles, text, args.repeat)
+        current, articles = timed(split_by_articles, text, args.repeat)
+        assert articles == expected, f"el segmentador nuevo no coincide con el original en {pdf}"
+
+        print(f"📄 {pdf} ({len(text):,} caracteres, {len(articles)} artículos)")
+        print(f"   regex original: {legacy * 1000:8.1f} ms")
+        print(f"   una pasada:     {current * 1000:8.1f} ms  (x{legacy / current:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import sys
+from dotenv import load_dotenv
+from app.index import EMBEDDING_MODEL
+from app.query import RERANKER_MODEL
+from app.runtime import ONNX_DIR, ONNX_QUANTIZATION, export_onnx
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Exporta el encoder y el cross-encoder a ONNX (y ONNX int8) y verifica su paridad con PyTorch."
+    )
+    parser.add_argument("--only", choices=["embedder", "cross-encoder"], help="exporta sólo uno de los modelos")
+    args = parser.parse_args()
+
+    models = [("embedder", EMBEDDING_MODEL), ("cross-encoder", RERANKER_MODEL)]
+    failed = False
+    for kind, name in models:
+        if args.only and args.only != kind:
+            continue
+        print(f"📦 Exportando {name} a {ONNX_DIR} (int8 para {ONNX_QUANTIZATION})...")
+        for runtime, result in export_onnx(name, kind).items():
+            details = ", ".join(f"{k}={v:.4f}" for k, v in result.items() if k != "passed")
+            status = "✅" if result["passed"] else "❌"
+            failed |= not result["passed"]
+            print(f"{status} {name} [{runtime}]: {details}")
+
+    if failed:
+        print("⚠️ Los runtimes que no pasaron la paridad no se usarán aunque MODEL_RUNTIME los pida.")
+        sys.exit(1)
+    print("🎉 Exportación lista. Activa el runtime con MODEL_RUNTIME=onnx o MODEL_RUNTIME=onnx-int8.")
+
+if __name__ == "__main__":
+    main()
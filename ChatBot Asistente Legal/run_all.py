@@ -1,39 +1,91 @@
 import subprocess
 import os
+import signal
 import sys
+import time
+
+# 🔹 Reinicio de servicios caídos: espera inicial, máximo y tiempo de vida que reinicia el backoff
+RESTART_BACKOFF = 1.0
+RESTART_BACKOFF_MAX = 60.0
+STABLE_SECONDS = 60.0
+SHUTDOWN_TIMEOUT = 30.0
+
+def default_workers() -> int:
+    # Cada worker ya usa INFERENCE_WORKERS hilos de inferencia
+    return max(1, (os.cpu_count() or 2) // int(os.getenv("INFERENCE_WORKERS", "2")))
 
 def main():
     # 🔹 Detectar ruta del Python activo (el de .venv)
     python_exe = sys.executable
+    services = {}
 
-    # 🔹 Ejecutar API FastAPI
-    api_process = subprocess.Popen(
-        [python_exe, "-m", "uvicorn", "app.api:app", "--port", "8001"]
-    )
+    # 🔹 API FastAPI: app/server.py carga los modelos una vez, hace fork de API_WORKERS workers
+    # (comparten la memoria de los modelos), vigila su /ready y reinicia los que caen.
+    # Con un solo worker, o sin os.fork (Windows), uvicorn directamente.
+    # Con BOT_SEARCH_MODE=inprocess el bot busca por su cuenta y la API no hace falta
+    workers = int(os.getenv("API_WORKERS", str(default_workers())))
+    if os.getenv("BOT_SEARCH_MODE", "http").lower() == "inprocess":
+        print("🔎 BOT_SEARCH_MODE=inprocess: el bot carga los modelos, no se levanta la API.")
+    elif workers > 1 and hasattr(os, "fork"):
+        services["API"] = [python_exe, "-m", "app.server", "--port", "8001", "--workers", str(workers)]
+    else:
+        services["API"] = [python_exe, "-m", "uvicorn", "app.api:app", "--port", "8001"]
 
     # 🔹 Detectar automáticamente el archivo del bot
-    bot_file = None
     if os.path.exists("bot.py"):
         bot_file = "bot.py"
     elif os.path.exists("app/telegram_bot.py"):
         bot_file = "app/telegram_bot.py"
     else:
         print("⚠️ No se encontró el archivo del bot (busqué bot.py y app/telegram_bot.py)")
-        api_process.terminate()
         return
 
     print(f"🤖 Ejecutando bot desde: {bot_file}")
+    # 🔹 Bot de Telegram con el mismo Python (como módulo, para que pueda importar app.*)
+    services["Bot"] = [python_exe, "-m", "app.telegram_bot"] if bot_file == "app/telegram_bot.py" else [python_exe, bot_file]
 
-    # 🔹 Ejecutar Bot de Telegram con el mismo Python
-    bot_process = subprocess.Popen([python_exe, bot_file])
+    supervise(services)
 
+def supervise(services):
+    """Mantiene vivos los servicios: si uno termina, se relanza con backoff exponencial."""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    state = {name: {"process": None, "started": 0.0, "crashes": 0, "restart_at": 0.0} for name in services}
     try:
-        api_process.wait()
-        bot_process.wait()
+        while not stopping:
+            now = time.monotonic()
+            for name, cmd in services.items():
+                s = state[name]
+                if s["process"] is None:
+                    if now >= s["restart_at"]:
+                        s["process"] = subprocess.Popen(cmd)
+                        s["started"] = now
+                    continue
+                code = s["process"].poll()
+                if code is None:
+                    continue
+                if now - s["started"] >= STABLE_SECONDS:
+                    s["crashes"] = 0
+                delay = min(RESTART_BACKOFF_MAX, RESTART_BACKOFF * 2 ** s["crashes"])
+                s["crashes"] += 1
+                s["restart_at"] = now + delay
+                s["process"] = None
+                print(f"⚠️ {name} terminó con código {code}; se reinicia en {delay:.0f}s.")
+            time.sleep(0.5)
     except KeyboardInterrupt:
-        print("🛑 Deteniendo servicios...")
-        api_process.terminate()
-        bot_process.terminate()
+        pass
+
+    print("🛑 Deteniendo servicios...")
+    processes = [s["process"] for s in state.values() if s["process"] is not None]
+    for process in processes:
+        process.terminate()
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for process in processes:
+        try:
+            process.wait(timeout=max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            process.kill()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
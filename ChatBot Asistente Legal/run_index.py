@@ -1,36 +1,282 @@
+import argparse
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dotenv import load_dotenv
-from app.ingest import load_legal_articles
-from app.index import build_embeddings_model, upsert_articles, init_pinecone
+from app.ingest import PDF_WORKERS, file_sha256, load_legal_articles
+from app import article_lookup, bm25
+from app.evaluation import GOLD_FILE, evaluate_version, load_gold
+from app.index import (
+    build_embeddings_model, upsert_articles, init_index, flush_index,
+    delete_vectors, manifest_path, build_chunks,
+    source_key, truncation_report, articles_dir, bm25_dir, index_root,
+    read_index_version, CHUNKER,
+)
+from app.manifest import IndexManifest
+from app.query import build_reranker
+from app.snapshot import SnapshotError, export_snapshot, import_snapshot
+from app.versions import (
+    KEEP_VERSIONS, activate_version, collect_garbage, create_version, drop_version, republish_active,
+)
 
 load_dotenv()
 
-index = init_pinecone()
-model = build_embeddings_model()
-
 DATA_DIR = "data"
+# 🔹 Validación de una versión nueva antes de publicarla: mínimos absolutos y caída
+# máxima de recall/MRR frente a la versión activa
+MIN_RECALL = float(os.getenv("MIN_RECALL", "0"))
+MIN_MRR = float(os.getenv("MIN_MRR", "0"))
+MAX_REGRESSION = float(os.getenv("MAX_REGRESSION", "0.02"))
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si el SO no lo expone)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS, bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def validate_version(version: str, model, args) -> bool:
+    """La versión nueva pasa si cumple los mínimos y no empeora a la activa más de MAX_REGRESSION."""
+    gold = load_gold(args.gold)
+    # Un solo cross-encoder para las dos versiones
+    reranker = build_reranker()
+    candidate = evaluate_version(version, model, reranker, gold, args.top_k)
+    active = read_index_version()
+    baseline = evaluate_version(active, model, reranker, gold, args.top_k)
+    print(f"🧪 Validación con {len(gold)} preguntas gold (top_k={args.top_k}):")
+    print(f"   activa {active or '-'}: recall {baseline['recall']:.3f}, MRR {baseline['mrr']:.3f}")
+    print(f"   nueva  {version}: recall {candidate['recall']:.3f}, MRR {candidate['mrr']:.3f}")
+
+    problems = []
+    for metric, minimum in (("recall", args.min_recall), ("mrr", args.min_mrr)):
+        if candidate[metric] < minimum:
+            problems.append(f"{metric} {candidate[metric]:.3f} < mínimo {minimum:.3f}")
+        if candidate[metric] < baseline[metric] - args.max_regression:
+            problems.append(f"{metric} {candidate[metric]:.3f} empeora {baseline[metric]:.3f} de la versión activa")
+    for problem in problems:
+        print(f"❌ {problem}")
+    return not problems
+
+def publish_version(version: str, model, args, validate: bool = True):
+    """Valida la versión, cambia el alias a ella y borra las versiones viejas; si no pasa, la descarta."""
+    if validate:
+        if model is None:
+            model = build_embeddings_model()
+        if not validate_version(version, model, args):
+            drop_version(version)
+            print(f"🚫 La versión {version} no se publicó; sigue activa {read_index_version() or 'la anterior'}.")
+            sys.exit(1)
+    activate_version(version)
+    print(f"🔖 Nueva versión del índice: {version} (alias actualizado)")
+    dropped = collect_garbage(args.keep)
+    if dropped:
+        print(f"🧹 Versiones borradas: {', '.join(dropped)}")
+
+def run_snapshot(args):
+    """Exporta el índice activo a un snapshot, o lo carga desde uno, sin re-embeber."""
+    try:
+        if args.export:
+            index = init_index()
+            manifest = IndexManifest(manifest_path())
+            try:
+                stats = export_snapshot(index, args.export, manifest)
+            finally:
+                manifest.close()
+            print(
+                f"📦 {stats['vectors']} vectores exportados a {args.export} "
+                f"({stats['bytes'] / (1024 * 1024):.1f} MB en {stats['seconds']:.1f}s)."
+            )
+            return
+
+        # Importar: en una versión nueva (blue/green) o, con --in-place, sobre la activa
+        if args.in_place:
+            version, index = None, init_index()
+        else:
+            version, index = create_version(seed=False)
+        root = index_root(version)
+        manifest = IndexManifest(manifest_path(root))
+        try:
+            stats = import_snapshot(index, args.import_path, manifest, root)
+            flush_index(index)
+        except Exception:
+            if version is not None:
+                drop_version(version)
+            raise
+        finally:
+            manifest.close()
+        print(
+            f"📥 {stats['vectors']} vectores importados de {args.import_path} "
+            f"({len(stats['sources'])} leyes, {stats['deleted']} eliminados, {stats['seconds']:.1f}s)."
+        )
+        if version is None:
+            print(f"🔖 Versión del índice actualizada en el sitio: {republish_active()}")
+        else:
+            # Los checksums del snapshot ya garantizan lo importado: el gold (que carga
+            # el modelo de embeddings y el cross-encoder) sólo corre con --validate
+            publish_version(version, None, args, validate=args.validate)
+    except SnapshotError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+def plan_laws(manifest, root: str, pdf_files, full: bool = False):
+    """
+    Qué hay que hacer respecto a `manifest` y los archivos de `root`:
+    (PDFs a (re)indexar como (ruta, ley, hash), leyes retiradas de data/).
+    """
+    # 🔹 PDFs idénticos a los ya indexados: nada que hacer
+    pending = []
+    for filename in pdf_files:
+        path = os.path.join(DATA_DIR, filename)
+        nombre_ley = os.path.splitext(filename)[0]
+        pdf_hash = file_sha256(path)
+        key = source_key(nombre_ley)
+        up_to_date = (
+            manifest.file_hash(nombre_ley) == pdf_hash
+            and bm25.has_source(bm25_dir(root), key)
+            and article_lookup.has_source(articles_dir(root), key)
+        )
+        if not full and up_to_date:
+            print(f"⏭️ {nombre_ley}: sin cambios desde la última indexación.")
+            continue
+        pending.append((path, nombre_ley, pdf_hash))
+
+    current = {os.path.splitext(f)[0] for f in pdf_files}
+    removed = [s for s in manifest.sources() if s not in current]
+    return pending, removed
+
+def index_laws(index, manifest, root: str, pending, removed, full: bool = False):
+    """
+    Indexa en `index` los PDFs pendientes, con BM25 y tabla de artículos en
+    `root`, y borra las leyes retiradas. Devuelve el modelo de embeddings si se cargó.
+    """
+    model = None
+    if pending:
+        model = build_embeddings_model()
+        # 🔹 Todas las leyes se extraen a la vez sobre un único pool de procesos;
+        # mientras se indexa una ley, las demás siguen extrayéndose.
+        with ProcessPoolExecutor(max_workers=PDF_WORKERS) as pdf_pool, \
+                ThreadPoolExecutor(max_workers=len(pending)) as loaders:
+            futures = [loaders.submit(load_legal_articles, path, pdf_pool) for path, _, _ in pending]
+
+            for (path, nombre_ley, pdf_hash), future in zip(pending, futures):
+                articles = future.result()
+
+                if not articles:
+                    print(f"⚠️ {nombre_ley}: no se detectaron artículos.")
+                    continue
+
+                print(f"📄 {nombre_ley}: {len(articles)} artículos detectados")
+                # Se trocea una sola vez: vectores, BM25 y tabla de artículos usan los mismos chunks
+                chunks = build_chunks(articles, nombre_ley, model)
+                if CHUNKER == "chars":
+                    # El chunker por tokens ya corta en la ventana del modelo: sólo aquí se pierde texto
+                    total_tokens, lost = truncation_report(model, chunks)
+                    print(
+                        f"✂️ Chunker por caracteres: {lost} de {total_tokens} tokens "
+                        f"({lost / max(total_tokens, 1):.0%}) quedan fuera de la ventana del modelo."
+                    )
+                stats = upsert_articles(index, model, articles, nombre_ley, manifest=manifest, full=full, chunks=chunks)
+                # BM25 y tabla de artículos de la ley completa (es barato), con los mismos ids que los vectores
+                bm25.write_source(bm25_dir(root), source_key(nombre_ley), chunks)
+                article_lookup.write_source(articles_dir(root), source_key(nombre_ley), chunks)
+                manifest.set_file_hash(nombre_ley, pdf_hash)
+                rss = peak_rss_mb()
+                rss_text = f"{rss:.0f} MB" if rss is not None else "n/d"
+                print(
+                    f"✅ {len(articles)} artículos de {nombre_ley} insertados en el índice "
+                    f"({stats['vectors_per_second']:.1f} vectores/s, pico RSS {rss_text})."
+                )
+
+    # 🔹 Leyes que ya no están en data/: borrar sus vectores
+    for nombre_ley in removed:
+        stale = list(manifest.chunk_hashes(nombre_ley))
+        delete_vectors(index, stale)
+        manifest.forget_source(nombre_ley)
+        bm25.remove_source(bm25_dir(root), source_key(nombre_ley))
+        article_lookup.remove_source(articles_dir(root), source_key(nombre_ley))
+        print(f"🗑️ {nombre_ley}: {len(stale)} vectores eliminados (PDF retirado de data/).")
+
+    flush_index(index)
+    return model
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Indexa las leyes de data/ en una versión nueva del índice y la publica si pasa la validación."
+    )
+    parser.add_argument("--full", action="store_true", help="re-embebe todo aunque el manifiesto indique que no cambió")
+    parser.add_argument("--in-place", action="store_true",
+                        help="actualiza la versión activa directamente (sin blue/green: se ven cambios a medias)")
+    parser.add_argument("--no-validate", action="store_true", help="publica la versión nueva sin pasar el gold")
+    parser.add_argument("--validate", action="store_true", help="con --import, pasa también el gold antes de publicar")
+    parser.add_argument("--gold", default=GOLD_FILE)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    parser.add_argument("--min-mrr", type=float, default=MIN_MRR)
+    parser.add_argument("--max-regression", type=float, default=MAX_REGRESSION)
+    parser.add_argument("--keep", type=int, default=KEEP_VERSIONS, help="versiones anteriores que se conservan")
+    actions = parser.add_mutually_exclusive_group()
+    actions.add_argument("--export", metavar="ARCHIVO", help="guarda vectores, ids y metadata en un snapshot .npz y termina")
+    actions.add_argument("--import", dest="import_path", metavar="ARCHIVO", help="carga un snapshot .npz en el índice y termina")
+    actions.add_argument("--activate", metavar="VERSIÓN", help="vuelve a publicar una versión conservada (rollback) y termina")
+    args = parser.parse_args()
+
+    if args.activate:
+        try:
+            activate_version(args.activate)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"🔖 Versión activa: {args.activate}")
+        return
 
-if not os.path.exists(DATA_DIR):
-    print(f"⚠️ Carpeta {DATA_DIR} no encontrada.")
-    exit(1)
+    if args.export or args.import_path:
+        run_snapshot(args)
+        return
 
-pdf_files = [f for f in os.listdir(DATA_DIR) if f.endswith(".pdf")]
+    if not os.path.exists(DATA_DIR):
+        print(f"⚠️ Carpeta {DATA_DIR} no encontrada.")
+        sys.exit(1)
 
-if not pdf_files:
-    print("⚠️ No se encontraron archivos PDF en la carpeta data.")
-    exit(1)
+    pdf_files = [f for f in os.listdir(DATA_DIR) if f.endswith(".pdf")]
 
-for filename in pdf_files:
-    path = os.path.join(DATA_DIR, filename)
-    nombre_ley = os.path.splitext(filename)[0]
-    articles = load_legal_articles(path)
+    if not pdf_files:
+        print("⚠️ No se encontraron archivos PDF en la carpeta data.")
+        sys.exit(1)
 
-    if not articles:
-        print(f"⚠️ {nombre_ley}: no se detectaron artículos.")
-        continue
+    # 🔹 Lo pendiente se decide contra la versión activa, antes de copiar nada
+    root = index_root()
+    manifest = IndexManifest(manifest_path(root))
+    try:
+        pending, removed = plan_laws(manifest, root, pdf_files, args.full)
+        if args.in_place and (pending or removed):
+            index_laws(init_index(), manifest, root, pending, removed, args.full)
+    finally:
+        manifest.close()
+    if not (pending or removed):
+        print("🎉 Nada que re-indexar: la versión activa ya está al día.")
+        return
+    if args.in_place:
+        print(f"🔖 Versión del índice actualizada en el sitio: {republish_active()}")
+        print("🎉 Todas las leyes fueron indexadas.")
+        return
 
-    print(f"📄 {nombre_ley}: {len(articles)} artículos detectados")
-    upsert_articles(index, model, articles, nombre_ley)
-    print(f"✅ {len(articles)} artículos de {nombre_ley} insertados en Pinecone.")
+    # 🔹 Blue/green: se construye una copia de la versión activa (vacía con --full) y sólo
+    # se publica si pasa la validación; mientras tanto la API sigue con la activa
+    version, index = create_version(seed=not args.full)
+    print(f"🆕 Construyendo la versión {version} del índice.")
+    manifest = IndexManifest(manifest_path(index_root(version)))
+    try:
+        model = index_laws(index, manifest, index_root(version), pending, removed, args.full)
+    except BaseException:
+        manifest.close()
+        drop_version(version)
+        raise
+    manifest.close()
+    publish_version(version, model, args, validate=not args.no_validate)
+    print("🎉 Todas las leyes fueron indexadas.")
 
-print("🎉 Todas las leyes fueron indexadas en Pinecone.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()